@@ -1,22 +1,46 @@
+import os
 import threading
-from typing import Generator, List, Tuple
-from sentence_transformers import SentenceTransformer
+from typing import TYPE_CHECKING, Generator, List, Tuple
 from app.config.logger import logger
-from app.config.env import PINECONE_KEY
+from app.config.env import (
+    PINECONE_KEY, INFERENCE_MODE, INFERENCE_WORKERS, INFERENCE_TORCH_THREADS, INFERENCE_MAX_PENDING,
+    NORMALIZE_EMBEDDINGS, EMBEDDING_CACHE_SIZE, EMBEDDING_CACHE_STORE, EMBEDDING_CACHE_PATH,
+    INFERENCE_BACKEND, ONNX_MODEL_DIR, ONNX_INTRA_OP_THREADS
+)
+from app.services.EmbeddingCache import EmbeddingCache, MongoVectors, SQLiteVectors
+from app.services.InferenceExecutor import InferenceExecutor
+from app.services.OnnxEncoder import MODEL_FILE, OnnxEncoder, export_onnx
+
+if TYPE_CHECKING:
+    from sentence_transformers import SentenceTransformer
 
 
 MODEL_NAME = "all-MiniLM-L6-v2"
 
-_model: SentenceTransformer | None = None
+_model: "SentenceTransformer | OnnxEncoder | None" = None
 _model_lock = threading.Lock()
 
+_inference: InferenceExecutor | None = None
+_inference_lock = threading.Lock()
+
+_embedding_cache: EmbeddingCache | None = None
+_embedding_cache_lock = threading.Lock()
+
 
-def get_model() -> SentenceTransformer:
+def get_model() -> "SentenceTransformer | OnnxEncoder":
     """Thread-safe lazy loading of the embedding model."""
     global _model
     if _model is None:
         with _model_lock:
-            if _model is None:
+            if _model is None and INFERENCE_BACKEND == "onnx":
+                if not os.path.exists(os.path.join(ONNX_MODEL_DIR, MODEL_FILE)):
+                    export_onnx(MODEL_NAME, ONNX_MODEL_DIR)
+                logger.info(f"Loading int8 ONNX encoder: {ONNX_MODEL_DIR}")
+                _model = OnnxEncoder(ONNX_MODEL_DIR, intra_op_threads=ONNX_INTRA_OP_THREADS)
+                logger.info("Model loaded successfully")
+            elif _model is None:
+                # Imported here so a process serving the ONNX backend does not load torch
+                from sentence_transformers import SentenceTransformer
                 logger.info(f"Loading SentenceTransformer: {MODEL_NAME}")
                 # Force CPU – Render free tier has no GPU
                 _model = SentenceTransformer(
@@ -25,3 +49,36 @@ def get_model() -> SentenceTransformer:
                 )
                 logger.info("Model loaded successfully")
     return _model
+
+
+def get_inference() -> InferenceExecutor:
+    """Thread-safe lazy creation of the executor every `encode` goes through."""
+    global _inference
+    if _inference is None:
+        with _inference_lock:
+            if _inference is None:
+                _inference = InferenceExecutor(
+                    get_model,
+                    workers=INFERENCE_WORKERS,
+                    mode=INFERENCE_MODE,
+                    torch_threads=INFERENCE_TORCH_THREADS,
+                    max_pending=INFERENCE_MAX_PENDING,
+                )
+    return _inference
+
+
+def get_embedding_cache() -> EmbeddingCache:
+    """Thread-safe lazy creation of the bio-hash embedding cache."""
+    global _embedding_cache
+    if _embedding_cache is None:
+        with _embedding_cache_lock:
+            if _embedding_cache is None:
+                store = None
+                if EMBEDDING_CACHE_STORE == "sqlite":
+                    store = SQLiteVectors(EMBEDDING_CACHE_PATH)
+                elif EMBEDDING_CACHE_STORE == "mongo":
+                    store = MongoVectors("embedding_cache")
+                # int8 vectors differ slightly from torch ones, so each backend has its own keys
+                _embedding_cache = EmbeddingCache(
+                    f"{MODEL_NAME}:{INFERENCE_BACKEND}", NORMALIZE_EMBEDDINGS, EMBEDDING_CACHE_SIZE, store=store)
+    return _embedding_cache
@@ -1,7 +1,13 @@
+import json
 from fastapi import FastAPI, Response, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from app.types import BatchSuggestionsRequest
 from app.services.Recommendation import Recommendation
+from app.utils import metrics
+from app.utils.page_cursor import CursorExpired
 from app.utils.reformat_to_bio import reformat_to_bio
-from app.config.ai import get_model
+from app.config.ai import get_inference
 
 
 data = [
@@ -444,8 +450,7 @@ def create_app():
     @app.get("/hello")
     async def read_roots(response: Response):
         bio = reformat_to_bio(user)['bio']
-        model = get_model()
-        query_vec = model.encode([bio])[0].tolist()
+        query_vec = (await get_inference().encode([bio]))[0].tolist()
         response.status_code = status.HTTP_200_OK
         return {"message": "Hello, FastAPI!", "hello": query_vec}
 
@@ -456,6 +461,38 @@ def create_app():
         response.status_code = status.HTTP_200_OK
         return {"message": "Hello, FastAPI!", "data": result}
 
+    @app.get("/suggestions/{user_id}/nearby")
+    async def nearby_suggestions(user_id: str, response: Response, maxDistanceKm: float = 50, limit: int = 20):
+        result = await Recommendation.recommend_nearby(user_id, maxDistanceKm, limit)
+        response.status_code = status.HTTP_200_OK
+        return {"message": "Hello, FastAPI!", "data": result}
+
+    @app.get("/suggestions/{user_id}/page")
+    async def suggestion_page(user_id: str, response: Response, limit: int = 20, cursor: str | None = None):
+        try:
+            page = await Recommendation.suggestion_page(user_id, limit, cursor)
+        except CursorExpired as e:
+            response.status_code = status.HTTP_410_GONE
+            return {"message": str(e)}
+        except ValueError as e:
+            response.status_code = status.HTTP_400_BAD_REQUEST
+            return {"message": str(e)}
+        response.status_code = status.HTTP_200_OK
+        return {"message": "Hello, FastAPI!", **page}
+
+    @app.post("/suggestions")
+    async def batch_suggestions(body: BatchSuggestionsRequest):
+        async def results():
+            # One NDJSON line per user as soon as its block has been scored
+            async for user_id, matches in Recommendation.recommend_many(body.userIds, body.limit):
+                yield json.dumps(jsonable_encoder({"userId": user_id, "data": matches})) + "\n"
+
+        return StreamingResponse(results(), media_type="application/x-ndjson")
+
+    @app.get("/metrics", response_class=PlainTextResponse)
+    async def prometheus_metrics():
+        return metrics.render()
+
     @app.get("/test")
     async def possible_matches(response: Response):
         response.status_code = status.HTTP_200_OK
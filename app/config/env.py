@@ -12,3 +12,83 @@ DATABASE_URL = os.getenv("DATABASE_URL")
 RABBITMQ_URL = os.getenv("RABBITMQ_URL")
 BATCH_SIZE = os.getenv("BATCH_SIZE") 
 PINECONE_KEY = os.getenv("PINECONE_KEY")
+
+#* user_ai queue micro-batching: flush after this many messages or milliseconds (1 = one at a time)
+USER_QUEUE_BATCH_SIZE = int(os.getenv("USER_QUEUE_BATCH_SIZE", 32))
+USER_QUEUE_BATCH_WINDOW_MS = int(os.getenv("USER_QUEUE_BATCH_WINDOW_MS", 50))
+
+#* L2-normalize embeddings once at write time so search is a plain dot product
+NORMALIZE_EMBEDDINGS = os.getenv("NORMALIZE_EMBEDDINGS", "true").lower() == "true"
+
+#* users.embedding write format: "binary" (packed float32 BSON vector) or "array" (legacy doubles)
+EMBEDDING_FORMAT = os.getenv("EMBEDDING_FORMAT", "binary")
+#* Rewrite legacy array embeddings to binary in the background on startup
+CONVERT_EMBEDDINGS = os.getenv("CONVERT_EMBEDDINGS", "true").lower() == "true"
+
+#* Candidates re-scored with float vectors after the int8 first pass
+RERANK_DEPTH = int(os.getenv("RERANK_DEPTH", 200))
+
+#* In-process vector search: "hnsw" / "ivf" (approximate) or "exact" (embedding store mat-vec)
+SEARCH_BACKEND = os.getenv("SEARCH_BACKEND", "hnsw")
+EMBEDDING_STORE_PATH = os.getenv("EMBEDDING_STORE_PATH", "data/embeddings.f32")
+ANN_INDEX_PATH = os.getenv("ANN_INDEX_PATH", "data/ann_index.bin")
+ANN_M = int(os.getenv("ANN_M", 16))
+ANN_EF_CONSTRUCTION = int(os.getenv("ANN_EF_CONSTRUCTION", 200))
+ANN_EF_SEARCH = int(os.getenv("ANN_EF_SEARCH", 64))
+
+#* IVF coarse-partition index
+IVF_INDEX_PATH = os.getenv("IVF_INDEX_PATH", "data/ivf_index.npz")
+IVF_NLIST = int(os.getenv("IVF_NLIST", 1024))
+IVF_NPROBE = int(os.getenv("IVF_NPROBE", 16))
+IVF_TRAIN_SAMPLE = int(os.getenv("IVF_TRAIN_SAMPLE", 100000))
+
+#* Partition the search backend into (gender, genderInterest, status) segments
+SEGMENTED_INDEX = os.getenv("SEGMENTED_INDEX", "false").lower() == "true"
+
+#* Exact scoring off the event loop: "process" pool or "thread" pool (BLAS releases the GIL)
+SCORING_MODE = os.getenv("SCORING_MODE", "process")
+SCORING_WORKERS = int(os.getenv("SCORING_WORKERS", os.cpu_count() or 1))
+SCORING_MIN_SHARD_ROWS = int(os.getenv("SCORING_MIN_SHARD_ROWS", 50000))
+
+#* Model inference off the event loop: "thread" pool sharing one model or "process" pool, one model each
+INFERENCE_MODE = os.getenv("INFERENCE_MODE", "thread")
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", 1))
+INFERENCE_TORCH_THREADS = int(os.getenv("INFERENCE_TORCH_THREADS", max(1, (os.cpu_count() or 2) // 2)))
+INFERENCE_MAX_PENDING = int(os.getenv("INFERENCE_MAX_PENDING", 64))  # encode calls in flight before callers wait
+#* Encoder backend: "torch" (SentenceTransformer) or "onnx" (int8 export, built into ONNX_MODEL_DIR if missing)
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "torch")
+ONNX_MODEL_DIR = os.getenv("ONNX_MODEL_DIR", "data/onnx/all-MiniLM-L6-v2")
+ONNX_INTRA_OP_THREADS = int(os.getenv("ONNX_INTRA_OP_THREADS", INFERENCE_TORCH_THREADS))
+
+#* Bio-hash -> vector cache: in-process LRU, optionally persisted to "sqlite" or "mongo"
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", 50000))
+EMBEDDING_CACHE_STORE = os.getenv("EMBEDDING_CACHE_STORE", "")
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "data/embedding_cache.sqlite")
+
+#* In-memory geo grid cell size for radius queries
+GEO_CELL_KM = float(os.getenv("GEO_CELL_KM", 20))
+
+#* Blended ranking: cosine similarity minus DISTANCE_WEIGHT * (1 - exp(-km / DISTANCE_SCALE_KM))
+DISTANCE_WEIGHT = float(os.getenv("DISTANCE_WEIGHT", 0.1))
+DISTANCE_SCALE_KM = float(os.getenv("DISTANCE_SCALE_KM", 50))
+
+#* Users whose liked-id sets are kept in memory (LRU)
+SEEN_CACHE_USERS = int(os.getenv("SEEN_CACHE_USERS", 100000))
+
+#* Precomputed suggestion lists
+SUGGESTIONS_SIZE = int(os.getenv("SUGGESTIONS_SIZE", 100))
+SUGGESTIONS_TTL = int(os.getenv("SUGGESTIONS_TTL", 6 * 60 * 60))  # seconds
+
+#* Query-side user profiles kept in memory; concurrent misses are loaded together
+PROFILE_CACHE_USERS = int(os.getenv("PROFILE_CACHE_USERS", 100000))
+PROFILE_CACHE_TTL = int(os.getenv("PROFILE_CACHE_TTL", 30 * 60))  # seconds
+PROFILE_BATCH_SIZE = int(os.getenv("PROFILE_BATCH_SIZE", 500))
+
+#* In-process cache of ranked suggestion lists, bounded by total cached profiles
+SUGGESTION_CACHE_MAX_PROFILES = int(os.getenv("SUGGESTION_CACHE_MAX_PROFILES", 200000))
+SUGGESTION_CACHE_TTL = int(os.getenv("SUGGESTION_CACHE_TTL", 10 * 60))  # seconds
+
+#* Paginated suggestions: ranking depth and how long a user's ranking is kept for later pages
+SUGGESTION_PAGE_DEPTH = int(os.getenv("SUGGESTION_PAGE_DEPTH", 200))
+SUGGESTION_PAGE_TTL = int(os.getenv("SUGGESTION_PAGE_TTL", 15 * 60))  # seconds
+SUGGESTION_PAGE_CACHE_USERS = int(os.getenv("SUGGESTION_PAGE_CACHE_USERS", 10000))
@@ -0,0 +1,168 @@
+import threading
+from app.services.ANNIndex import ANNIndex
+from app.services.EmbeddingStore import EmbeddingStore
+from app.services.FeatureStore import FeatureStore
+from app.services.GeoIndex import GeoIndex
+from app.services.IVFIndex import IVFIndex
+from app.services.ScoringExecutor import ScoringExecutor
+from app.services.SegmentedIndex import SegmentedIndex, StoreSegment
+from app.config.env import (
+    ANN_INDEX_PATH, ANN_M, ANN_EF_CONSTRUCTION, ANN_EF_SEARCH,
+    EMBEDDING_STORE_PATH, SEARCH_BACKEND, IVF_INDEX_PATH, IVF_NLIST, IVF_NPROBE,
+    SCORING_MODE, SCORING_WORKERS, SCORING_MIN_SHARD_ROWS, GEO_CELL_KM, SEGMENTED_INDEX
+)
+
+
+_index: ANNIndex | None = None
+_index_lock = threading.Lock()
+
+_store: EmbeddingStore | None = None
+_store_lock = threading.Lock()
+
+_ivf: IVFIndex | None = None
+_ivf_lock = threading.Lock()
+
+_segments: SegmentedIndex | None = None
+_segments_lock = threading.Lock()
+
+_features: FeatureStore | None = None
+_features_lock = threading.Lock()
+
+_geo: GeoIndex | None = None
+_geo_lock = threading.Lock()
+
+_executor: ScoringExecutor | None = None
+_executor_lock = threading.Lock()
+
+
+def get_index() -> ANNIndex:
+    """Thread-safe lazy loading of the in-process ANN index."""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                index = ANNIndex(
+                    ANN_INDEX_PATH,
+                    m=ANN_M,
+                    ef_construction=ANN_EF_CONSTRUCTION,
+                    ef_search=ANN_EF_SEARCH,
+                )
+                index.load()
+                _index = index
+    return _index
+
+
+def set_index(index: ANNIndex) -> None:
+    """Swap in a freshly built index."""
+    global _index
+    with _index_lock:
+        _index = index
+
+
+def get_store() -> EmbeddingStore:
+    """Thread-safe lazy opening of the memory-mapped embedding store."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = EmbeddingStore(EMBEDDING_STORE_PATH)
+    return _store
+
+
+def set_store(store: EmbeddingStore) -> None:
+    """Use `store` instead of opening EMBEDDING_STORE_PATH; call before anything reads the store."""
+    global _store
+    with _store_lock:
+        _store = store
+
+
+def get_ivf() -> IVFIndex:
+    """Thread-safe lazy loading of the IVF index."""
+    global _ivf
+    if _ivf is None:
+        with _ivf_lock:
+            if _ivf is None:
+                ivf = IVFIndex(IVF_INDEX_PATH, nlist=IVF_NLIST, nprobe=IVF_NPROBE)
+                ivf.load()
+                _ivf = ivf
+    return _ivf
+
+
+def set_ivf(ivf: IVFIndex) -> None:
+    """Swap in a freshly trained IVF index."""
+    global _ivf
+    with _ivf_lock:
+        _ivf = ivf
+
+
+def new_segments() -> SegmentedIndex:
+    """An empty segmented index whose segments use the configured backend."""
+    if SEARCH_BACKEND == "exact":
+        return SegmentedIndex(lambda: StoreSegment(get_store()))
+    if SEARCH_BACKEND == "ivf":
+        # Segments share the global index's trained coarse quantizer
+        return SegmentedIndex(lambda: get_ivf().empty_like(quantizer=True))
+    return SegmentedIndex(lambda: get_index().empty_like())
+
+
+def get_segments() -> SegmentedIndex:
+    """Thread-safe lazy creation of the segmented index (filled by `Recommendation.build_segments`)."""
+    global _segments
+    if _segments is None:
+        with _segments_lock:
+            if _segments is None:
+                _segments = new_segments()
+    return _segments
+
+
+def set_segments(segments: SegmentedIndex) -> None:
+    """Swap in a freshly built segmented index."""
+    global _segments
+    with _segments_lock:
+        _segments = segments
+
+
+def get_features() -> FeatureStore:
+    """Thread-safe lazy creation of the columnar profile features (filled by `Recommendation.build_features`)."""
+    global _features
+    if _features is None:
+        with _features_lock:
+            if _features is None:
+                _features = FeatureStore(get_store())
+    return _features
+
+
+def get_geo() -> GeoIndex:
+    """Thread-safe lazy creation of the in-memory geo grid (filled by `Recommendation.build_geo`)."""
+    global _geo
+    if _geo is None:
+        with _geo_lock:
+            if _geo is None:
+                _geo = GeoIndex(cell_km=GEO_CELL_KM)
+    return _geo
+
+
+def get_executor() -> ScoringExecutor:
+    """Thread-safe lazy creation of the sharded scoring executor over the store."""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ScoringExecutor(
+                    get_store(),
+                    workers=SCORING_WORKERS,
+                    mode=SCORING_MODE,
+                    min_shard_rows=SCORING_MIN_SHARD_ROWS,
+                )
+    return _executor
+
+
+def get_search_index() -> ANNIndex | IVFIndex | EmbeddingStore | SegmentedIndex:
+    """The structure `Recommendation.recommend` queries for its top-k ids."""
+    if SEGMENTED_INDEX:
+        return get_segments()
+    if SEARCH_BACKEND == "exact":
+        return get_store()
+    if SEARCH_BACKEND == "ivf":
+        return get_ivf()
+    return get_index()
@@ -1,4 +1,4 @@
-from typing import Any
+from typing import Any, List
 from bson.objectid import ObjectId
 from app.config.logger import logger
 from app.config.db import db
@@ -6,14 +6,20 @@ from app.types import QueueConfig
 from app.utils.RabbitMQRouter import RabbitMQRouter
 from app.constants import QueueName, exchange
 from app.services.AI import AI
+from app.services.Recommendation import Recommendation
 from bson.json_util import dumps
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from app.config.env import USER_QUEUE_BATCH_SIZE, USER_QUEUE_BATCH_WINDOW_MS
 
 user = RabbitMQRouter(QueueConfig(
     name=QueueName.USER_QUEUE.value,
     durable=True,
     routing_key_pattern="user_ai.*",
     exchange=exchange,
-    handlers={}
+    handlers={},
+    batch_size=USER_QUEUE_BATCH_SIZE,
+    batch_window_ms=USER_QUEUE_BATCH_WINDOW_MS
 ))
 
 
@@ -34,17 +40,28 @@ async def embed(message: Any, io: Any) -> None:
 
     print(user)
 
-    embedding_result = AI.json_to_embedding(user)
+    changed, unchanged = await AI.changed([user])
+    if unchanged:
+        Recommendation.on_profile(str(user['_id']), user)
+        print(f"⏭️ Bio fields unchanged, embedding kept")
+        return
+    if not changed:
+        print(f"🤷 No document found with the given {user['_id']}")
+        return
+
+    embedding_result = await AI.json_to_embedding(user)
     collection = db["users"]
     user_id = embedding_result['_id']
 
     try:
         result = await collection.update_one(
             {'_id': ObjectId(user_id)},
-            {'$set': {'embedding': embedding_result['embedding']}}
+            AI.embedding_update(embedding_result['embedding'], AI.fingerprint(user))
         )
 
         if result.matched_count > 0:
+            Recommendation.on_embedding(user_id, embedding_result['embedding'], user)
+            Recommendation.on_profile(user_id, user)
             print(f"👍 User embeddings has been updated")
         else:
             print(f"🤷 No document found with the given {user_id}")
@@ -52,6 +69,71 @@ async def embed(message: Any, io: Any) -> None:
         logger.error(f"🛑 Failed to update embeddings : {e}")
 
 
+def _index_written(written: List[Any]) -> None:
+    """Push (user, embedding result) pairs whose Mongo write succeeded into the in-process indexes."""
+    for user, result in written:
+        Recommendation.on_embedding(result['_id'], result['embedding'], user)
+        Recommendation.on_profile(result['_id'], user)
+
+
+async def embed_batch(messages: List[Any], io: Any) -> None:
+    # Latest payload per user wins when one burst holds several of their updates
+    users = list({str(message['payload']['_id']): message['payload'] for message in messages}.values())
+
+    # The fingerprint lookup also tells which users exist, so unknown ones are never indexed
+    changed, unchanged = await AI.changed(users)
+    for user in unchanged:
+        Recommendation.on_profile(str(user['_id']), user)
+
+    if changed:
+        embedding_results = await AI.json_to_embedding_many(changed)
+        try:
+            await db["users"].bulk_write([
+                UpdateOne({'_id': ObjectId(result['_id'])},
+                          AI.embedding_update(result['embedding'], AI.fingerprint(user)))
+                for user, result in zip(changed, embedding_results)
+            ], ordered=False)
+        except BulkWriteError as e:
+            # The written documents already carry the new fingerprint, so the per-message
+            # retry would skip them as unchanged: index them before re-raising
+            failed = {error['index'] for error in e.details.get('writeErrors', [])}
+            _index_written([pair for i, pair in enumerate(zip(changed, embedding_results)) if i not in failed])
+            raise
+        _index_written(list(zip(changed, embedding_results)))
+    print(f"👍 {len(changed)} user embeddings updated, {len(unchanged)} unchanged")
+    if len(changed) + len(unchanged) < len(users):
+        print(f"🤷 No document found for {len(users) - len(changed) - len(unchanged)} of them")
+
+
+async def like(message: Any, io: Any) -> None:
+    like = message['payload']
+    Recommendation.on_like(like['userId'], like['likedUserId'])
+    print(f"👍 Like {like['userId']} -> {like['likedUserId']} recorded")
+
+
+async def unlike(message: Any, io: Any) -> None:
+    like = message['payload']
+    Recommendation.on_like(like['userId'], like['likedUserId'], liked=False)
+    print(f"👍 Like {like['userId']} -> {like['likedUserId']} removed")
+
+
+async def profile(message: Any, io: Any) -> None:
+    user = message['payload']
+    Recommendation.on_profile(str(user['_id']), user)
+    print(f"👍 Profile features of {user['_id']} updated")
+
+
+async def location(message: Any, io: Any) -> None:
+    user = message['payload']
+    Recommendation.on_location(str(user['_id']), user.get('location'))
+    print(f"📍 Location of {user['_id']} updated")
+
+
 user.route("user_ai.embed", embed)
+user.route_batch("user_ai.embed", embed_batch)
+user.route("user_ai.like", like)
+user.route("user_ai.unlike", unlike)
+user.route("user_ai.profile", profile)
+user.route("user_ai.location", location)
 user.route("user_ai.upsert_embeddings", upsert_embeddings)
 user.route("user_ai.delete_embeddings", delete_embeddings)
@@ -1,28 +1,123 @@
-from typing import Generator, List, Tuple
+import asyncio
+import hashlib
+import json
+from datetime import datetime
+from typing import AsyncGenerator, List, Tuple
 from app.config.db import db
-from app.utils.reformat_to_bio import reformat_to_bio
-from app.config.ai import get_model
+from app.utils.reformat_to_bio import BIO_FIELDS, reformat_to_bio
+from app.utils import quantize, topk
+from app.utils.bson_vector import decode_vector, decode_vectors, encode_vector
+from app.config.ai import MODEL_NAME, get_embedding_cache, get_inference
 from app.config.logger import logger
+from app.config.env import NORMALIZE_EMBEDDINGS, RERANK_DEPTH, EMBEDDING_FORMAT
+from app.services.EmbeddingStore import EmbeddingStore
 from sklearn.metrics.pairwise import cosine_similarity
 import numpy as np
 from bson import ObjectId
 from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorCollection
 from pymongo import UpdateOne
+from app.utils.metrics import Counter
+
+FINGERPRINT_CHECKS = Counter("embed_fingerprint_checks_total",
+                             "Embed requests by bio fingerprint result; unchanged ones skip encoding and the write")
 
 
 class AI:
 
+    EMBEDDING_FIELDS = ("embedding", "embeddingNormalized", "embeddingQ", "embeddingFingerprint")
+
+    @staticmethod
+    def normalize(vectors) -> np.ndarray:
+        vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        return vectors / np.where(norms == 0, 1, norms)
+
+    @staticmethod
+    def encode_embedding(embedding):
+        """`users.embedding` in the configured storage format."""
+        if EMBEDDING_FORMAT == "binary":
+            return encode_vector(embedding)
+        return np.asarray(embedding, dtype=np.float32).tolist()
+
     @classmethod
-    def json_to_embeddings(cls, json_data: List[dict], batch_size: int = 100
-                           ) -> Generator[Tuple[List, List], None, None]:
-        """Yield (embeddings, ids) for each batch."""
-        model = get_model()
+    def embedding_update(cls, embedding: List[float], fingerprint: str | None = None) -> dict:
+        """
+        `$set` update for a freshly encoded embedding: the float vector, flagged
+        if it is unit length, plus its int8 quantization for first-pass scoring
+        and the fingerprint of the profile it was encoded from.
+        """
+        fields = {
+            "embedding": cls.encode_embedding(embedding),
+            "embeddingNormalized": NORMALIZE_EMBEDDINGS,
+            "embeddingQ": quantize.to_field(cls.normalize(embedding)),
+        }
+        if fingerprint is not None:
+            fields["embeddingFingerprint"] = fingerprint
+        return {"$set": fields}
+
+    @staticmethod
+    def fingerprint(user: dict) -> str:
+        """
+        Hash of the fields `reformat_to_bio` reads, plus the model and normalization
+        applied. The bio states an age derived from the current year, so the year
+        is hashed too and every profile re-embeds once after New Year.
+        """
+        fields = {field: user.get(field) for field in BIO_FIELDS}
+        raw = json.dumps([MODEL_NAME, NORMALIZE_EMBEDDINGS, datetime.now().year, fields],
+                         sort_keys=True, default=str)
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    @classmethod
+    async def changed(cls, users: List[dict], batch_size: int = 1000) -> Tuple[List[dict], List[dict]]:
+        """
+        Split `users` into (changed, unchanged) against the fingerprints stored
+        next to their embeddings. Users without a document are in neither.
+        """
+        changed, unchanged = [], []
+        collection = db["users"]
+        for start in range(0, len(users), batch_size):
+            batch = users[start:start + batch_size]
+            cursor = collection.find(
+                {"_id": {"$in": [ObjectId(user['_id']) for user in batch]}}, {"embeddingFingerprint": 1})
+            stored = {str(doc['_id']): doc.get('embeddingFingerprint') async for doc in cursor}
+            for user in batch:
+                _id = str(user['_id'])
+                if _id in stored:
+                    (unchanged if stored[_id] == cls.fingerprint(user) else changed).append(user)
 
+        FINGERPRINT_CHECKS.inc(len(changed), result="changed")
+        FINGERPRINT_CHECKS.inc(len(unchanged), result="unchanged")
+        FINGERPRINT_CHECKS.inc(len(users) - len(changed) - len(unchanged), result="missing")
+        return changed, unchanged
+
+    @classmethod
+    async def encode_bios(cls, bios: List[str], batch_size: int = 32) -> np.ndarray:
+        """
+        Embeddings of `bios`, from the bio-hash cache where present; only
+        distinct uncached bios go through the model, in one `encode` call.
+        """
+        cache = get_embedding_cache()
+        keys = [cache.key(bio) for bio in bios]
+        vectors = await cache.get_many(keys)
+
+        missing = {key: bio for key, bio in zip(keys, bios) if key not in vectors}
+        if missing:
+            encoded = await get_inference().encode(
+                list(missing.values()), batch_size=batch_size, normalize_embeddings=NORMALIZE_EMBEDDINGS)
+            fresh = dict(zip(missing, encoded))
+            await cache.put_many(fresh)
+            vectors.update(fresh)
+        return np.vstack([vectors[key] for key in keys]).astype(np.float32, copy=False)
+
+    @classmethod
+    async def json_to_embeddings(cls, json_data: List[dict], batch_size: int = 100
+                                 ) -> AsyncGenerator[Tuple[List, List], None]:
+        """Yield (embeddings, ids) for each batch."""
         for i in range(0, len(json_data), batch_size):
             batch = json_data[i:i + batch_size]
             bios = [reformat_to_bio(item)['bio'] for item in batch]
             try:
-                batch_emb = model.encode(bios, batch_size=batch_size)
+                batch_emb = await cls.encode_bios(bios, batch_size=batch_size)
                 ids = [item['_id'] for item in batch]
                 yield batch_emb.tolist(), ids
             except Exception as e:
@@ -30,13 +125,21 @@ class AI:
                 continue
 
     @classmethod
-    def json_to_embedding(cls, json_data: dict) -> List:
+    async def json_to_embedding_many(cls, json_data: List[dict]) -> List[dict]:
+        """`json_to_embedding` for many users with one `encode` call; raises if it fails."""
+        bios = [reformat_to_bio(item) for item in json_data]
+        embeddings = await cls.encode_bios([bio['bio'] for bio in bios], batch_size=len(bios))
+        return [{"_id": str(bio['_id']), "embedding": embedding.tolist()}
+                for bio, embedding in zip(bios, embeddings)]
+
+    @classmethod
+    async def json_to_embedding(cls, json_data: dict) -> dict:
         result = reformat_to_bio(json_data)
-        model = get_model()
-        embeddings = model.encode(result['bio'])
-        return {"_id":  str(result['_id']), "embedding": embeddings.tolist()}
+        embeddings = await cls.encode_bios([result['bio']])
+        return {"_id":  str(result['_id']), "embedding": embeddings[0].tolist()}
         # return [(result['_id'], embeddings, {"_id": str(result['_id'])})]
 
+    @classmethod
     async def update_embeddings(
         cls,
         json_data: List[dict],
@@ -45,12 +148,18 @@ class AI:
         total_updated = 0
         collection = db["users"]
 
-        for embeddings, ids in cls.json_to_embeddings(json_data, batch_size):
+        # Users whose bio fields still match their stored fingerprint are neither encoded nor written
+        json_data, unchanged = await cls.changed(json_data)
+        if unchanged:
+            logger.info(f"Skipping {len(unchanged)} users with unchanged bio fields")
+        fingerprints = {str(user['_id']): cls.fingerprint(user) for user in json_data}
+
+        async for embeddings, ids in cls.json_to_embeddings(json_data, batch_size):
             try:
                 operations = [
                     UpdateOne(
                         {"_id": ObjectId(_id)},               # filter
-                        {"$set": {"embedding": vec}},         # update
+                        cls.embedding_update(vec, fingerprints[str(_id)]),  # update
                         upsert=False,
                     )
                     for _id, vec in zip(ids, embeddings)
@@ -79,26 +188,176 @@ class AI:
         return total_updated
 
     @classmethod
-    def search(cls, query_embedding_arr: list[float], embeddings_arr: list[dict], top_k: int = 5) -> None:
-        query_embedding = np.array(query_embedding_arr, dtype=np.float32)
-        embeddings = [np.array(doc["embedding"], dtype=np.float32)
-                      for doc in embeddings_arr]
-
-        # Cosine similarity between query and every candidate
-        similarities = cosine_similarity([query_embedding], embeddings)[0]
-
-        top_indices = np.argsort(similarities)[-top_k:][::-1]
-        top_scores = similarities[top_indices]
-
-        print(
-            f"\nTop {top_k} most similar results (out of {len(embeddings)} candidates):")
-        result = []
-        for idx, score in zip(top_indices, top_scores):
-            match = embeddings_arr[idx]
-            doc_id = match["_id"]
-            del match["embedding"]
-            result.append(match)
-            print(
-                f"  • Index {idx} | _id: {doc_id} | similarity = {score:.4f}")
-
-        return result
+    async def normalize_embeddings(cls, batch_size: int = 500) -> int:
+        """Migration: L2-normalize every stored embedding that is not flagged yet."""
+        total_updated = 0
+        collection = db["users"]
+        cursor = collection.find(
+            {"embedding": {"$exists": True}, "embeddingNormalized": {"$ne": True}},
+            {"_id": 1, "embedding": 1}
+        ).batch_size(batch_size)
+
+        async def flush(batch):
+            vectors = cls.normalize(decode_vectors([user['embedding'] for user in batch]))
+            operations = [
+                UpdateOne(
+                    {"_id": user['_id']},
+                    {"$set": {"embedding": cls.encode_embedding(vec), "embeddingNormalized": True}},
+                )
+                for user, vec in zip(batch, vectors)
+            ]
+            result = await collection.bulk_write(operations, ordered=False)
+            return result.modified_count
+
+        batch = []
+        async for user in cursor:
+            batch.append(user)
+            if len(batch) == batch_size:
+                total_updated += await flush(batch)
+                logger.info(f"Normalized {total_updated} embeddings so far")
+                batch = []
+        if batch:
+            total_updated += await flush(batch)
+
+        logger.info(f"Embedding normalization complete: {total_updated} documents updated.")
+        return total_updated
+
+    @classmethod
+    async def convert_embeddings(cls, batch_size: int = 500, pause: float = 0.0) -> int:
+        """
+        Rewrite legacy array `users.embedding` values as binary vectors, adding
+        `embeddingQ` where it is missing. Readers accept both formats meanwhile.
+        """
+        total_updated = 0
+        collection = db["users"]
+        cursor = collection.find(
+            {"embedding": {"$type": "array"}},
+            {"_id": 1, "embedding": 1, "embeddingQ": 1}
+        ).batch_size(batch_size)
+
+        async def flush(batch):
+            operations = []
+            for user in batch:
+                vector = decode_vector(user['embedding'])
+                fields = {"embedding": encode_vector(vector)}
+                if "embeddingQ" not in user:
+                    fields["embeddingQ"] = quantize.to_field(cls.normalize(vector))
+                # Match the old value too, so a concurrent re-embed is never overwritten
+                operations.append(UpdateOne(
+                    {"_id": user['_id'], "embedding": user['embedding']},
+                    {"$set": fields}
+                ))
+            result = await collection.bulk_write(operations, ordered=False)
+            return result.modified_count
+
+        batch = []
+        async for user in cursor:
+            batch.append(user)
+            if len(batch) == batch_size:
+                total_updated += await flush(batch)
+                logger.info(f"Converted {total_updated} embeddings to binary so far")
+                batch = []
+                await asyncio.sleep(pause)
+        if batch:
+            total_updated += await flush(batch)
+
+        logger.info(f"Embedding conversion complete: {total_updated} documents updated.")
+        return total_updated
+
+    @staticmethod
+    def profile(doc: dict) -> dict:
+        """Copy of a candidate document without its embedding fields."""
+        return {key: value for key, value in doc.items() if key not in AI.EMBEDDING_FIELDS}
+
+    @classmethod
+    def similarities(cls, query_embedding_arr: list[float], embeddings_arr: list[dict],
+                     store: EmbeddingStore | None = None, query_normalized: bool = False
+                     ) -> np.ndarray:
+        similarities = np.empty(len(embeddings_arr), dtype=np.float32)
+        rows = [store.row(doc["_id"]) if store else None for doc in embeddings_arr]
+
+        in_store = [i for i, row in enumerate(rows) if row is not None]
+        if in_store:
+            # Candidates in the store: one mat-vec, no per-document conversion
+            similarities[in_store] = store.score(
+                query_embedding_arr, [rows[i] for i in in_store], normalized=query_normalized)
+
+        rest = [i for i, row in enumerate(rows) if row is None]
+        if rest:
+            docs = [embeddings_arr[i] for i in rest]
+            query_embedding = np.array(query_embedding_arr, dtype=np.float32)
+            embeddings = decode_vectors([doc["embedding"] for doc in docs])
+
+            if query_normalized and all(doc.get("embeddingNormalized") for doc in docs):
+                # Unit vectors on both sides: cosine similarity is the dot product
+                similarities[rest] = embeddings @ query_embedding
+            else:
+                similarities[rest] = cosine_similarity([query_embedding], embeddings)[0]
+
+        return similarities
+
+    @classmethod
+    def search(cls, query_embedding_arr: list[float], embeddings_arr: list[dict], top_k: int = 5,
+               store: EmbeddingStore | None = None, query_normalized: bool = False,
+               rerank_depth: int = RERANK_DEPTH) -> List[dict]:
+        """
+        Top `top_k` candidates, best first, as new dicts without embedding fields.
+
+        Candidates carrying `embeddingQ` get a first pass over their int8 codes
+        and only the best `rerank_depth` of them are re-scored exactly, from the
+        store or the document's float `embedding`, whichever is available.
+        """
+        if not embeddings_arr:
+            return []
+
+        query = query_embedding_arr if query_normalized else cls.normalize(query_embedding_arr)
+        similarities = np.full(len(embeddings_arr), -np.inf, dtype=np.float32)
+        candidates = range(len(embeddings_arr))
+
+        quantized = [i for i, doc in enumerate(embeddings_arr) if "embeddingQ" in doc]
+        if quantized:
+            approx = quantize.scores(
+                *quantize.from_fields([embeddings_arr[i]["embeddingQ"] for i in quantized]), query)
+            shortlist = {quantized[i] for i in topk.top_k(approx, rerank_depth).indices}
+            similarities[quantized] = np.where(
+                [i in shortlist for i in quantized], approx, -np.inf)
+            unquantized = set(candidates) - set(quantized)
+            candidates = sorted(shortlist | unquantized)
+
+        exact = [i for i in candidates
+                 if "embedding" in embeddings_arr[i] or (store and embeddings_arr[i]["_id"] in store)]
+        if exact:
+            similarities[exact] = cls.similarities(
+                query, [embeddings_arr[i] for i in exact], store=store, query_normalized=True)
+
+        best = topk.top_k(similarities, top_k)
+        logger.debug(
+            f"Top {len(best.ids)} of {len(embeddings_arr)} candidates: scores {best.scores.tolist()}")
+        # Candidates cut from the int8 shortlist, or without any vector, were never scored
+        return [cls.profile(embeddings_arr[i]) for i, score in zip(best.indices, best.scores)
+                if score != -np.inf]
+
+    @classmethod
+    def stream_vector(cls, doc: dict) -> np.ndarray:
+        """Unit-length vector of a streamed candidate, dequantized from `embeddingQ` when it has one."""
+        if "embeddingQ" in doc:
+            # Codes quantize the normalized vector, so this is unit length up to rounding
+            return quantize.dequantize(*quantize.from_fields([doc["embeddingQ"]]))[0]
+        # Only legacy documents written before normalization pay for it here
+        if doc.get("embeddingNormalized"):
+            return decode_vector(doc["embedding"])
+        return cls.normalize(decode_vector(doc["embedding"]))
+
+    @classmethod
+    async def search_cursor(cls, query_embedding_arr: list[float], cursor, top_k: int = 5,
+                            query_normalized: bool = False) -> List[dict]:
+        """Like `search`, but for candidates streamed from a Motor cursor."""
+        query = query_embedding_arr if query_normalized else cls.normalize(query_embedding_arr)
+        best, docs = await topk.top_k_stream(
+            cursor,
+            query,
+            top_k,
+            vector=cls.stream_vector,
+        )
+        logger.debug(f"Top {len(best.ids)} streamed candidates: scores {best.scores.tolist()}")
+        return [cls.profile(dict(doc, _id=str(doc["_id"]))) for doc in docs]
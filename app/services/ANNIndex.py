@@ -0,0 +1,116 @@
+import json
+import os
+import threading
+from typing import Dict, List, Tuple
+import hnswlib
+import numpy as np
+from app.config.logger import logger
+
+
+class ANNIndex:
+    """HNSW index over user embeddings, keyed by the user's `_id` string."""
+
+    DIM = 384  # all-MiniLM-L6-v2 embedding size
+    INITIAL_CAPACITY = 1024
+
+    def __init__(self, path: str, m: int = 16, ef_construction: int = 200, ef_search: int = 64):
+        self.path = path
+        self.m = m
+        self.ef_construction = ef_construction
+        self.ef_search = ef_search
+        self._lock = threading.Lock()
+        self._ids: List[str] = []             # label -> _id
+        self._labels: Dict[str, int] = {}     # _id -> label
+        self._index = self._new_index(self.INITIAL_CAPACITY)
+
+    def _new_index(self, capacity: int) -> hnswlib.Index:
+        index = hnswlib.Index(space="cosine", dim=self.DIM)
+        index.init_index(
+            max_elements=capacity,
+            ef_construction=self.ef_construction,
+            M=self.m,
+        )
+        index.set_ef(self.ef_search)
+        return index
+
+    def __len__(self) -> int:
+        return len(self._labels)
+
+    def __contains__(self, _id: str) -> bool:
+        return _id in self._labels
+
+    def upsert(self, ids: List[str], vectors) -> None:
+        """Insert new vectors or overwrite the vectors of ids already indexed."""
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.DIM)
+        if len(ids) != len(vectors):
+            raise ValueError("ids and vectors must have the same length")
+
+        with self._lock:
+            labels = []
+            for _id in ids:
+                _id = str(_id)
+                label = self._labels.get(_id)
+                if label is None:
+                    label = len(self._ids)
+                    self._ids.append(_id)
+                    self._labels[_id] = label
+                labels.append(label)
+
+            capacity = self._index.get_max_elements()
+            if len(self._ids) > capacity:
+                self._index.resize_index(max(len(self._ids), capacity * 2))
+
+            self._index.add_items(vectors, np.asarray(labels, dtype=np.int64))
+
+    def remove(self, _id: str) -> None:
+        with self._lock:
+            label = self._labels.pop(str(_id), None)
+            if label is not None:
+                self._index.mark_deleted(label)
+
+    def query(self, vector, k: int) -> List[Tuple[str, float]]:
+        """Return up to `k` (_id, cosine similarity) pairs, best first."""
+        with self._lock:
+            k = min(k, len(self._labels))
+            if k == 0:
+                return []
+            self._index.set_ef(max(self.ef_search, k))
+            labels, distances = self._index.knn_query(
+                np.asarray(vector, dtype=np.float32).reshape(1, self.DIM), k=k)
+
+        return [(self._ids[label], 1.0 - float(distance))
+                for label, distance in zip(labels[0], distances[0])]
+
+    def save(self) -> None:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._lock:
+            self._index.save_index(self.path)
+            with open(f"{self.path}.ids.json", "w") as f:
+                json.dump({"ids": self._ids, "live": list(self._labels)}, f)
+        logger.info(f"Saved ANN index with {len(self)} vectors to {self.path}")
+
+    def load(self) -> bool:
+        if not (os.path.exists(self.path) and os.path.exists(f"{self.path}.ids.json")):
+            return False
+
+        with open(f"{self.path}.ids.json") as f:
+            meta = json.load(f)
+
+        index = hnswlib.Index(space="cosine", dim=self.DIM)
+        index.load_index(self.path)
+        index.set_ef(self.ef_search)
+
+        with self._lock:
+            self._index = index
+            self._ids = meta["ids"]
+            live = set(meta["live"])
+            self._labels = {_id: label for label, _id in enumerate(self._ids)
+                            if _id in live}
+        logger.info(f"Loaded ANN index with {len(self)} vectors from {self.path}")
+        return True
+
+    def empty_like(self) -> "ANNIndex":
+        return ANNIndex(self.path, m=self.m, ef_construction=self.ef_construction,
+                        ef_search=self.ef_search)
@@ -0,0 +1,123 @@
+import asyncio
+import hashlib
+import os
+import sqlite3
+import threading
+from typing import Dict, List
+import numpy as np
+from cachetools import LRUCache
+from pymongo import UpdateOne
+from app.config.db import db
+from app.config.logger import logger
+from app.utils.bson_vector import decode_vector, encode_vector
+from app.utils.metrics import Counter, Gauge, labels
+
+LOOKUPS = Counter("embedding_cache_lookups_total", "Bio embedding lookups by tier that answered them")
+_totals = {"hits": 0, "lookups": 0}
+Gauge("embedding_cache_hit_ratio", "Share of bio embedding lookups answered without encoding",
+      collect=lambda: {labels(): _totals["hits"] / _totals["lookups"] if _totals["lookups"] else 0.0})
+
+
+class SQLiteVectors:
+    """`key -> float32 vector` side table in a local SQLite file."""
+
+    def __init__(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)")
+        self._db.commit()
+
+    def _get_many(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        found = {}
+        with self._lock:
+            for start in range(0, len(keys), 500):   # stay under SQLite's bound-parameter limit
+                chunk = keys[start:start + 500]
+                rows = self._db.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(chunk))})", chunk)
+                found.update((key, np.frombuffer(blob, dtype="<f4").copy()) for key, blob in rows)
+        return found
+
+    def _put_many(self, vectors: Dict[str, np.ndarray]) -> None:
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                [(key, np.asarray(vector, dtype="<f4").tobytes()) for key, vector in vectors.items()])
+            self._db.commit()
+
+    async def get_many(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        return await asyncio.to_thread(self._get_many, keys)
+
+    async def put_many(self, vectors: Dict[str, np.ndarray]) -> None:
+        await asyncio.to_thread(self._put_many, vectors)
+
+
+class MongoVectors:
+    """`key -> float32 vector` side table in a Mongo collection, as BSON binary vectors."""
+
+    def __init__(self, collection_name: str):
+        self.collection = db[collection_name]
+
+    async def get_many(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        cursor = self.collection.find({"_id": {"$in": keys}}, {"vector": 1})
+        return {doc['_id']: decode_vector(doc['vector']) async for doc in cursor}
+
+    async def put_many(self, vectors: Dict[str, np.ndarray]) -> None:
+        await self.collection.bulk_write([
+            UpdateOne({"_id": key}, {"$set": {"vector": encode_vector(vector)}}, upsert=True)
+            for key, vector in vectors.items()
+        ], ordered=False)
+
+
+class EmbeddingCache:
+    """
+    Content-addressed embeddings: the key is a hash of the model, the
+    normalization flag and the generated bio, so any profile edit that leaves
+    the bio unchanged gets the same vector back without a forward pass.
+
+    An in-process LRU sits in front of an optional persistent side table,
+    which survives restarts and is shared between instances when in Mongo.
+    """
+
+    def __init__(self, model_name: str, normalized: bool, size: int, store=None):
+        self.model_name = model_name
+        self.normalized = normalized
+        self.store = store
+        self._vectors: LRUCache = LRUCache(maxsize=size)
+
+    def key(self, bio: str) -> str:
+        raw = f"{self.model_name}\0{int(self.normalized)}\0{bio}".encode()
+        return hashlib.sha256(raw).hexdigest()
+
+    async def get_many(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        """Cached vectors for whichever of `keys` have one."""
+        keys = list(dict.fromkeys(keys))
+        found = {key: self._vectors[key] for key in keys if key in self._vectors}
+        LOOKUPS.inc(len(found), tier="memory")
+
+        missing = [key for key in keys if key not in found]
+        if missing and self.store is not None:
+            try:
+                stored = await self.store.get_many(missing)
+            except Exception as e:
+                logger.error(f"Embedding cache store lookup failed: {e}")
+                stored = {}
+            LOOKUPS.inc(len(stored), tier="store")
+            for key, vector in stored.items():
+                self._vectors[key] = found[key] = vector
+
+        LOOKUPS.inc(len(keys) - len(found), tier="miss")
+        _totals["lookups"] += len(keys)
+        _totals["hits"] += len(found)
+        return found
+
+    async def put_many(self, vectors: Dict[str, np.ndarray]) -> None:
+        for key, vector in vectors.items():
+            self._vectors[key] = np.asarray(vector, dtype=np.float32)
+        if vectors and self.store is not None:
+            try:
+                await self.store.put_many(vectors)
+            except Exception as e:
+                logger.error(f"Failed to persist {len(vectors)} cached embeddings: {e}")
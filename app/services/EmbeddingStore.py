@@ -0,0 +1,315 @@
+import json
+import os
+import threading
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from app.config.logger import logger
+from app.utils.topk import TopK, top_k
+
+
+class EmbeddingStore:
+    """
+    All user embeddings in one contiguous, memory-mapped float32 matrix.
+
+    Rows are L2-normalized so a query is scored with a single mat-vec.
+    Deleted rows are tombstoned in the `alive` column and never reused.
+    The files live next to each other on disk, so every worker process that
+    opens the same path shares the page cache; read-only workers call
+    `refresh()` to pick up rows appended by the writer.
+    """
+
+    DIM = 384  # all-MiniLM-L6-v2 embedding size
+    INITIAL_CAPACITY = 1024
+    ID_DTYPE = "S24"  # ObjectId hex string
+
+    def __init__(self, path: str, readonly: bool = False, lookups: bool = True):
+        self.path = path
+        self.readonly = readonly
+        self.lookups = lookups  # scoring-only workers skip building the _id -> row map
+        self._lock = threading.Lock()
+        self._count = 0
+        self._capacity = 0
+        self._rows: Dict[str, int] = {}
+        self._meta_mtime = None
+        self._inode = None
+
+        if not readonly:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+
+        meta = self._read_meta()
+        if meta is None and readonly:
+            # Nothing written yet, `refresh()` maps the files once they exist
+            self._matrix = np.empty((0, self.DIM), dtype=np.float32)
+            self._alive = np.empty(0, dtype=np.bool_)
+            self._id_column = np.empty(0, dtype=self.ID_DTYPE)
+            return
+        self._map(meta["capacity"] if meta else self.INITIAL_CAPACITY)
+        self._count = meta["count"] if meta else 0
+        self._index_rows()
+
+    # ------------------------------------------------------------------
+    # Files
+    # ------------------------------------------------------------------
+    def _column(self, suffix: str, dtype, shape: tuple) -> np.memmap:
+        path = f"{self.path}{suffix}"
+        if self.readonly:
+            return np.memmap(path, dtype=dtype, mode="r", shape=shape)
+
+        size = int(np.prod(shape)) * np.dtype(dtype).itemsize
+        with open(path, "ab"):
+            pass
+        if os.path.getsize(path) < size:
+            with open(path, "r+b") as f:
+                f.truncate(size)
+        return np.memmap(path, dtype=dtype, mode="r+", shape=shape)
+
+    def _map(self, capacity: int) -> None:
+        self._matrix = self._column("", np.float32, (capacity, self.DIM))
+        self._alive = self._column(".alive", np.bool_, (capacity,))
+        self._id_column = self._column(".ids", self.ID_DTYPE, (capacity,))
+        self._capacity = capacity
+        self._inode = os.stat(self.path).st_ino
+
+    def _read_meta(self) -> Optional[dict]:
+        path = f"{self.path}.meta.json"
+        if not os.path.exists(path):
+            return None
+        self._meta_mtime = os.path.getmtime(path)
+        with open(path) as f:
+            return json.load(f)
+
+    def _write_meta(self) -> None:
+        path = f"{self.path}.meta.json"
+        with open(f"{path}.tmp", "w") as f:
+            json.dump({"dim": self.DIM, "count": self._count, "capacity": self._capacity}, f)
+        os.replace(f"{path}.tmp", path)
+
+    def _index_rows(self) -> None:
+        if not self.lookups:
+            return
+        ids = self._id_column[:self._count]
+        alive = np.flatnonzero(self._alive[:self._count])
+        self._rows = {ids[row].decode(): int(row) for row in alive}
+
+    # ------------------------------------------------------------------
+    # Lookups
+    # ------------------------------------------------------------------
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __contains__(self, _id: str) -> bool:
+        return str(_id) in self._rows
+
+    def row(self, _id: str) -> Optional[int]:
+        return self._rows.get(str(_id))
+
+    def id_at(self, row: int) -> str:
+        return self._id_column[row].decode()
+
+    def vector(self, _id: str) -> Optional[np.ndarray]:
+        row = self.row(_id)
+        return None if row is None else np.array(self._matrix[row])
+
+    @property
+    def matrix(self) -> np.ndarray:
+        """Rows [0, count) including tombstones; check `alive` before use."""
+        return self._matrix[:self._count]
+
+    @property
+    def alive(self) -> np.ndarray:
+        return self._alive[:self._count]
+
+    # ------------------------------------------------------------------
+    # Writes
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        return vectors / np.where(norms == 0, 1, norms)
+
+    def upsert(self, ids: List[str], vectors) -> None:
+        """Overwrite rows of known ids in place and append rows for new ones."""
+        if self.readonly:
+            raise RuntimeError("EmbeddingStore was opened read-only")
+        vectors = self._normalize(np.asarray(vectors, dtype=np.float32).reshape(-1, self.DIM))
+        if len(ids) != len(vectors):
+            raise ValueError("ids and vectors must have the same length")
+
+        with self._lock:
+            rows = []
+            for _id in ids:
+                _id = str(_id)
+                row = self._rows.get(_id)
+                if row is None:
+                    row = self._count
+                    self._count += 1
+                    self._rows[_id] = row
+                rows.append(row)
+
+            if self._count > self._capacity:
+                self._matrix.flush()
+                self._map(max(self._count, self._capacity * 2))
+
+            rows = np.asarray(rows)
+            self._matrix[rows] = vectors
+            self._id_column[rows] = [str(_id).encode() for _id in ids]
+            self._alive[rows] = True
+
+    def delete(self, _id: str) -> bool:
+        if self.readonly:
+            raise RuntimeError("EmbeddingStore was opened read-only")
+        with self._lock:
+            row = self._rows.pop(str(_id), None)
+            if row is None:
+                return False
+            self._alive[row] = False
+            return True
+
+    def _replaced(self) -> bool:
+        """True once another process has moved a different store over `path`."""
+        try:
+            return os.stat(self.path).st_ino != self._inode
+        except FileNotFoundError:
+            return True
+
+    def flush(self) -> None:
+        with self._lock:
+            if self._replaced():
+                # Our rows live in the unlinked files now; writing the metadata would
+                # pair our row count with the other store's rows
+                logger.warning(f"{self.path} was replaced by another store, not flushing over it")
+                return
+            self._matrix.flush()
+            self._alive.flush()
+            self._id_column.flush()
+            self._write_meta()
+        logger.info(f"Flushed embedding store with {len(self)} vectors to {self.path}")
+
+    def move_to(self, path: str) -> None:
+        """
+        Flush, then move the files over the store at `path`, metadata last, so
+        the new rows are in place before any reader can pick up their count.
+        """
+        self.flush()
+        with self._lock:
+            for suffix in (".ids", ".alive", "", ".meta.json"):
+                os.replace(f"{self.path}{suffix}", f"{path}{suffix}")
+            self.path = path
+        logger.info(f"Moved embedding store to {path}")
+
+    def remap(self, capacity: int, count: int) -> None:
+        """Follow a writer in another process that has grown to `capacity` rows."""
+        with self._lock:
+            if capacity != self._capacity:
+                self._map(capacity)
+            self._count = count
+
+    @property
+    def capacity(self) -> int:
+        return self._capacity
+
+    @property
+    def count(self) -> int:
+        return self._count
+
+    def refresh(self) -> bool:
+        """Re-read rows appended by the writer process. Returns True on change."""
+        path = f"{self.path}.meta.json"
+        if not os.path.exists(path) or os.path.getmtime(path) == self._meta_mtime:
+            return False
+        meta = self._read_meta()
+        with self._lock:
+            if meta["capacity"] != self._capacity:
+                self._map(meta["capacity"])
+            self._count = meta["count"]
+            self._index_rows()
+        return True
+
+    # ------------------------------------------------------------------
+    # Scoring
+    # ------------------------------------------------------------------
+    def score(self, query, rows=None, normalized: bool = False) -> np.ndarray:
+        """Cosine similarity of `query` against every row (or just `rows`)."""
+        query = np.asarray(query, dtype=np.float32).reshape(self.DIM)
+        if not normalized:
+            query = self._normalize(query)
+        if rows is not None:
+            return np.asarray(self._matrix[np.asarray(rows)] @ query)
+
+        count = self._count
+        scores = np.asarray(self._matrix[:count] @ query)
+        scores[~self._alive[:count]] = -np.inf
+        return scores
+
+    def query(self, vector, k: int, normalized: bool = False) -> List[Tuple[str, float]]:
+        """Exact top-k (_id, cosine similarity) pairs, best first."""
+        # Tombstones score -inf, so capping k at the live count never returns one
+        best = top_k(self.score(vector, normalized=normalized), min(k, len(self)))
+        return [(self.id_at(row), float(score))
+                for row, score in zip(best.indices, best.scores)]
+
+    def top_k_range(self, queries: np.ndarray, start: int, stop: int, k: int,
+                    mask: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        (rows, scores) of the best `k` live rows in [start, stop) for each of the
+        already-normalized `queries`, as (queries x k) arrays in no particular order.
+        Rows where `mask` (aligned with [start, stop)) is False score -inf.
+        """
+        stop = min(stop, self._count)
+        if stop <= start or k <= 0:
+            return (np.empty((len(queries), 0), dtype=np.int64),
+                    np.empty((len(queries), 0), dtype=np.float32))
+
+        scores = np.asarray(queries @ self._matrix[start:stop].T)
+        scores[:, ~self._alive[start:stop]] = -np.inf
+        if mask is not None:
+            scores[:, ~mask[:stop - start]] = -np.inf
+        k = min(k, stop - start)
+        keep = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        return keep + start, np.take_along_axis(scores, keep, axis=1)
+
+    @staticmethod
+    def merge_top_k(rows: np.ndarray, scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Keep the best `k` columns per query of stacked (rows, scores) candidates."""
+        k = min(k, scores.shape[1])
+        if k == 0:
+            return rows, scores
+        keep = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        return np.take_along_axis(rows, keep, axis=1), np.take_along_axis(scores, keep, axis=1)
+
+    def to_top_k(self, rows: np.ndarray, scores: np.ndarray, k: int) -> List[TopK]:
+        """Sort merged per-query candidates into TopK results carrying `_id`s."""
+        results = []
+        for query_scores, query_rows in zip(scores, rows):
+            best = top_k(query_scores, min(k, len(self)))
+            results.append(best._replace(
+                ids=[self.id_at(row) for row in query_rows[best.indices]],
+                indices=query_rows[best.indices],
+            ))
+        return results
+
+    def normalize_queries(self, vectors, normalized: bool = False) -> np.ndarray:
+        queries = np.asarray(vectors, dtype=np.float32).reshape(-1, self.DIM)
+        return queries if normalized else self._normalize(queries)
+
+    def query_many(self, vectors, k: int, block_size: int = 65536,
+                   normalized: bool = False) -> List[TopK]:
+        """
+        Exact top-k rows for many queries at once.
+
+        Scores are computed as one (queries x block) matrix product per block
+        of `block_size` rows, and each block is folded into a running top-k,
+        so memory stays at O(queries x block_size) whatever the store size.
+        """
+        queries = self.normalize_queries(vectors, normalized)
+        best_rows = np.empty((len(queries), 0), dtype=np.int64)
+        best_scores = np.empty((len(queries), 0), dtype=np.float32)
+
+        for start in range(0, self._count, block_size):
+            rows, scores = self.top_k_range(queries, start, start + block_size, k)
+            best_rows, best_scores = self.merge_top_k(
+                np.hstack([best_rows, rows]), np.hstack([best_scores, scores]), k)
+
+        return self.to_top_k(best_rows, best_scores, k)
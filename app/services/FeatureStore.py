@@ -0,0 +1,180 @@
+import threading
+from datetime import date, datetime
+from typing import Dict, Optional
+import numpy as np
+from app.services.EmbeddingStore import EmbeddingStore
+from app.utils.geo import coordinates, haversine_km
+
+
+class FeatureStore:
+    """
+    Struct-of-arrays profile features, aligned with the embedding store rows.
+
+    Every hard filter (status, gender both ways, age range both ways, height)
+    is evaluated for all rows as one boolean mask, so candidates that can
+    never match are dropped before any vector is scored.
+    """
+
+    FIELDS = ("status", "gender", "genderInterest", "dateOfBirth", "minAge", "maxAge", "height", "location")
+    PROJECTION = {field: 1 for field in FIELDS}
+
+    UNKNOWN = 0            # code of a missing categorical value
+    NO_BIRTH = np.iinfo(np.int32).min
+    MAX_AGE = 200
+    INITIAL_CAPACITY = 1024
+
+    def __init__(self, store: EmbeddingStore):
+        self.store = store
+        self.ready = False     # set once the columns have been filled from Mongo
+        self._lock = threading.Lock()
+        self._capacity = 0
+        # Gender and genderInterest share one vocabulary so their codes compare
+        self._codes: Dict[str, Dict[str, int]] = {"status": {}, "gender": {}}
+        self._grow(self.INITIAL_CAPACITY)
+
+    def _grow(self, capacity: int) -> None:
+        def column(name, dtype, fill):
+            grown = np.full(capacity, fill, dtype=dtype)
+            if self._capacity:
+                grown[:self._capacity] = getattr(self, name)
+            setattr(self, name, grown)
+
+        column("status", np.int8, self.UNKNOWN)
+        column("gender", np.int8, self.UNKNOWN)
+        column("interest", np.int8, self.UNKNOWN)
+        column("birth", np.int32, self.NO_BIRTH)       # days since 1970-01-01
+        column("min_age", np.int16, 0)
+        column("max_age", np.int16, self.MAX_AGE)
+        column("height", np.float32, np.nan)
+        column("lat", np.float32, np.nan)
+        column("lng", np.float32, np.nan)
+        self._capacity = capacity
+
+    # ------------------------------------------------------------------
+    # Encoding
+    # ------------------------------------------------------------------
+    def _code(self, vocabulary: str, value) -> int:
+        if not value or not isinstance(value, str):
+            return self.UNKNOWN
+        codes = self._codes[vocabulary]
+        if value not in codes:
+            codes[value] = len(codes) + 1
+        return codes[value]
+
+    @staticmethod
+    def _days(value) -> Optional[int]:
+        if isinstance(value, str):
+            try:
+                value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+            except ValueError:
+                return None
+        if isinstance(value, datetime):
+            value = value.date()
+        if not isinstance(value, date):
+            return None
+        return (value - date(1970, 1, 1)).days
+
+    @staticmethod
+    def _number(value, default):
+        try:
+            return type(default)(value) if value not in (None, "") else default
+        except (TypeError, ValueError):
+            return default
+
+    @staticmethod
+    def _age(birth, today: int):
+        return (today - birth) // 365.2425
+
+    # ------------------------------------------------------------------
+    # Writes
+    # ------------------------------------------------------------------
+    def upsert(self, _id: str, doc: dict) -> bool:
+        """
+        Write a user's features into their embedding row; False if they have
+        none yet. Only fields present in `doc` are written, so a partial
+        profile event leaves the others as they were.
+        """
+        row = self.store.row(_id)
+        if row is None:
+            return False
+        birth = self._days(doc.get("dateOfBirth"))
+        point = coordinates(doc.get("location"))
+
+        with self._lock:
+            if row >= self._capacity:
+                self._grow(max(2 * self._capacity, row + 1))
+            if "status" in doc:
+                self.status[row] = self._code("status", doc["status"])
+            if "gender" in doc:
+                self.gender[row] = self._code("gender", doc["gender"])
+            if "genderInterest" in doc:
+                self.interest[row] = self._code("gender", doc["genderInterest"])
+            if "dateOfBirth" in doc:
+                self.birth[row] = self.NO_BIRTH if birth is None else birth
+            if "minAge" in doc:
+                self.min_age[row] = self._number(doc["minAge"], 0)
+            if "maxAge" in doc:
+                self.max_age[row] = self._number(doc["maxAge"], self.MAX_AGE)
+            if "height" in doc:
+                self.height[row] = self._number(doc["height"], float("nan"))
+            if "location" in doc:
+                self.lat[row], self.lng[row] = point if point else (np.nan, np.nan)
+        return True
+
+    def distances(self, lat: float, lng: float, rows=None) -> np.ndarray:
+        """Haversine km from (lat, lng) to every row (or just `rows`); NaN where unknown."""
+        select = np.arange(self.store.count) if rows is None else np.asarray(rows, dtype=np.int64)
+        inside = (select >= 0) & (select < self._capacity)
+        select = np.where(inside, select, 0)
+        distances = haversine_km(lat, lng, self.lat[select], self.lng[select])
+        distances[~inside] = np.nan
+        return distances
+
+    # ------------------------------------------------------------------
+    # Filters
+    # ------------------------------------------------------------------
+    def mask(self, user: dict, rows=None, min_height: float | None = None,
+             max_height: float | None = None) -> np.ndarray:
+        """
+        True for the rows (all store rows, or just `rows`) that pass every hard
+        filter against `user`, a raw user document: active, reciprocal gender
+        interest, each inside the other's age range, optional height bounds.
+        Unknown birth dates and heights never exclude anyone.
+        """
+        count = self.store.count
+        select = np.arange(count) if rows is None else np.asarray(rows, dtype=np.int64)
+        inside = (select >= 0) & (select < self._capacity)
+        select = np.where(inside, select, 0)
+
+        ok = inside & (self.status[select] == self._codes["status"].get("active", -1))
+        gender = self._code("gender", user.get("gender"))
+        if gender != self.UNKNOWN:
+            ok &= self.interest[select] == gender
+        interest = self._code("gender", user.get("genderInterest"))
+        if interest != self.UNKNOWN:
+            ok &= self.gender[select] == interest
+
+        today = (date.today() - date(1970, 1, 1)).days
+        birth = self.birth[select]
+        known = birth != self.NO_BIRTH
+        ages = self._age(birth.astype(np.int64), today)
+        min_age = self._number(user.get("minAge"), 0)
+        max_age = self._number(user.get("maxAge"), self.MAX_AGE)
+        ok &= ~known | ((ages >= min_age) & (ages <= max_age))
+
+        my_birth = self._days(user.get("dateOfBirth"))
+        if my_birth is not None:
+            my_age = self._age(my_birth, today)
+            ok &= (self.min_age[select] <= my_age) & (my_age <= self.max_age[select])
+
+        height = self.height[select]
+        if min_height is not None:
+            ok &= np.isnan(height) | (height >= min_height)
+        if max_height is not None:
+            ok &= np.isnan(height) | (height <= max_height)
+
+        if user.get("_id") is not None:
+            own = self.store.row(str(user["_id"]))
+            if own is not None:
+                ok &= select != own
+        return ok
@@ -0,0 +1,104 @@
+import math
+import threading
+from typing import Dict, List, Tuple
+import numpy as np
+from app.utils.geo import KM_PER_DEGREE, haversine_km
+
+
+class GeoIndex:
+    """
+    In-memory grid over user coordinates for radius queries.
+
+    The globe is cut into square cells of `cell_km` of latitude; a query
+    reads only the cells overlapping the circle's bounding box and filters
+    them with one vectorized haversine pass.
+    """
+
+    def __init__(self, cell_km: float = 10.0):
+        # Snap the cell size so longitude columns tile the antimeridian exactly
+        self._lng_cells = max(1, round(360 / (cell_km / KM_PER_DEGREE)))
+        self.cell_deg = 360 / self._lng_cells
+        self._lock = threading.Lock()
+        self._coords: Dict[Tuple[int, int], np.ndarray] = {}   # cell -> (n, 2) lat/lng, grown by doubling
+        self._cell_ids: Dict[Tuple[int, int], List[str]] = {}
+        self._where: Dict[str, Tuple[Tuple[int, int], int]] = {}  # _id -> (cell, position)
+
+    def __len__(self) -> int:
+        return len(self._where)
+
+    def __contains__(self, _id: str) -> bool:
+        return str(_id) in self._where
+
+    def _cell(self, lat: float, lng: float) -> Tuple[int, int]:
+        return int(math.floor(lat / self.cell_deg)), int(math.floor((lng + 180) / self.cell_deg)) % self._lng_cells
+
+    # ------------------------------------------------------------------
+    # Writes
+    # ------------------------------------------------------------------
+    def _remove_locked(self, _id: str) -> None:
+        where = self._where.pop(_id, None)
+        if where is None:
+            return
+        cell, position = where
+        ids, coords = self._cell_ids[cell], self._coords[cell]
+        last = len(ids) - 1
+        if position != last:
+            # Swap the last entry into the hole so cells stay dense
+            ids[position] = ids[last]
+            coords[position] = coords[last]
+            self._where[ids[position]] = (cell, position)
+        ids.pop()
+        if not ids:
+            del self._cell_ids[cell], self._coords[cell]
+
+    def upsert(self, _id: str, lat: float, lng: float) -> None:
+        _id = str(_id)
+        cell = self._cell(lat, lng)
+        with self._lock:
+            self._remove_locked(_id)
+            ids = self._cell_ids.setdefault(cell, [])
+            coords = self._coords.get(cell)
+            if coords is None or len(ids) == len(coords):
+                grown = np.empty((max(4, 2 * len(ids)), 2), dtype=np.float64)
+                if coords is not None:
+                    grown[:len(ids)] = coords
+                coords = self._coords[cell] = grown
+            coords[len(ids)] = (lat, lng)
+            self._where[_id] = (cell, len(ids))
+            ids.append(_id)
+
+    def remove(self, _id: str) -> None:
+        with self._lock:
+            self._remove_locked(str(_id))
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+    def _cells_near(self, lat: float, lng: float, radius_km: float) -> List[Tuple[int, int]]:
+        dlat = radius_km / KM_PER_DEGREE
+        lat_cells = range(int(math.floor((lat - dlat) / self.cell_deg)),
+                          int(math.floor((lat + dlat) / self.cell_deg)) + 1)
+        # Longitude degrees shrink towards the poles; near them every column is in range
+        cos_lat = math.cos(math.radians(min(90.0, abs(lat) + dlat)))
+        dlng = 360.0 if cos_lat < 1e-6 else radius_km / (KM_PER_DEGREE * cos_lat)
+        if dlng >= 180 or len(lat_cells) * min(self._lng_cells, 2 * dlng / self.cell_deg + 2) > len(self._cell_ids):
+            # Bounding box covers more cells than are occupied: filter the occupied ones instead
+            return [cell for cell in self._cell_ids if cell[0] in lat_cells]
+        first = int(math.floor((lng - dlng + 180) / self.cell_deg))
+        last = int(math.floor((lng + dlng + 180) / self.cell_deg))
+        lng_cells = {column % self._lng_cells for column in range(first, last + 1)}
+        return [(row, column) for row in lat_cells for column in lng_cells
+                if (row, column) in self._cell_ids]
+
+    def within(self, lat: float, lng: float, radius_km: float) -> Tuple[List[str], np.ndarray]:
+        """(_ids, distances in km) of every point within `radius_km`, unordered."""
+        with self._lock:
+            cells = self._cells_near(lat, lng, radius_km)
+            if not cells:
+                return [], np.empty(0)
+            ids = [_id for cell in cells for _id in self._cell_ids[cell]]
+            coords = np.concatenate([self._coords[cell][:len(self._cell_ids[cell])] for cell in cells])
+
+        distances = haversine_km(lat, lng, coords[:, 0], coords[:, 1])
+        inside = np.flatnonzero(distances <= radius_km)
+        return [ids[i] for i in inside], distances[inside]
@@ -0,0 +1,194 @@
+import os
+import threading
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from app.config.logger import logger
+from app.utils.topk import top_k
+
+
+class IVFIndex:
+    """
+    Inverted-file index over user embeddings.
+
+    A spherical k-means coarse quantizer splits the vectors into `nlist`
+    lists; a query scores only the lists of its `nprobe` nearest centroids.
+    Vectors are stored L2-normalized, so scores are cosine similarities.
+    """
+
+    DIM = 384  # all-MiniLM-L6-v2 embedding size
+    MIN_POINTS_PER_LIST = 39  # fewer training points per centroid gives unstable lists
+
+    def __init__(self, path: str, nlist: int = 1024, nprobe: int = 16):
+        self.path = path
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self._lock = threading.Lock()
+        self.centroids: Optional[np.ndarray] = None
+        self._vectors: List[np.ndarray] = []
+        self._list_ids: List[List[str]] = []
+        self._where: Dict[str, Tuple[int, int]] = {}   # _id -> (list, position)
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        return vectors / np.where(norms == 0, 1, norms)
+
+    def __len__(self) -> int:
+        return len(self._where)
+
+    def __contains__(self, _id: str) -> bool:
+        return str(_id) in self._where
+
+    @property
+    def trained(self) -> bool:
+        return self.centroids is not None
+
+    def list_sizes(self) -> np.ndarray:
+        return np.asarray([len(ids) for ids in self._list_ids])
+
+    # ------------------------------------------------------------------
+    # Training
+    # ------------------------------------------------------------------
+    def _assign(self, vectors: np.ndarray, centroids: np.ndarray, block_size: int = 65536) -> np.ndarray:
+        return np.concatenate([
+            np.argmax(vectors[start:start + block_size] @ centroids.T, axis=1)
+            for start in range(0, len(vectors), block_size)
+        ]) if len(vectors) else np.empty(0, dtype=np.int64)
+
+    def train(self, sample, iterations: int = 20, seed: int = 0) -> None:
+        """Fit the coarse quantizer on a sample of embeddings; empties the lists."""
+        sample = self._normalize(np.asarray(sample, dtype=np.float32).reshape(-1, self.DIM))
+        nlist = max(1, min(self.nlist, len(sample) // self.MIN_POINTS_PER_LIST))
+        rng = np.random.default_rng(seed)
+        centroids = sample[rng.choice(len(sample), size=nlist, replace=False)].copy()
+
+        for _ in range(iterations):
+            assignment = self._assign(sample, centroids)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, sample)
+            counts = np.bincount(assignment, minlength=nlist)
+
+            # Re-seed empty lists with random points so every centroid is used
+            empty = np.flatnonzero(counts == 0)
+            sums[empty] = sample[rng.choice(len(sample), size=len(empty))]
+            centroids = self._normalize(sums)
+
+        with self._lock:
+            self._reset(centroids.astype(np.float32))
+        logger.info(f"Trained IVF quantizer with {nlist} lists on {len(sample)} vectors")
+
+    def _reset(self, centroids: np.ndarray) -> None:
+        self.centroids = centroids
+        self._vectors = [np.empty((0, self.DIM), dtype=np.float32) for _ in range(len(centroids))]
+        self._list_ids = [[] for _ in range(len(centroids))]
+        self._where = {}
+
+    # ------------------------------------------------------------------
+    # Writes
+    # ------------------------------------------------------------------
+    def _remove_locked(self, _id: str) -> None:
+        where = self._where.pop(_id, None)
+        if where is None:
+            return
+        list_no, position = where
+        ids, vectors = self._list_ids[list_no], self._vectors[list_no]
+        last = len(ids) - 1
+        if position != last:
+            # Swap the last entry into the hole so lists stay dense
+            ids[position] = ids[last]
+            vectors[position] = vectors[last]
+            self._where[ids[position]] = (list_no, position)
+        ids.pop()
+
+    def upsert(self, ids: List[str], vectors) -> None:
+        if not self.trained:
+            raise RuntimeError("IVF index must be trained before vectors are added")
+        vectors = self._normalize(np.asarray(vectors, dtype=np.float32).reshape(-1, self.DIM))
+        if len(ids) != len(vectors):
+            raise ValueError("ids and vectors must have the same length")
+
+        assignment = self._assign(vectors, self.centroids)
+        with self._lock:
+            for _id, vector, list_no in zip(ids, vectors, assignment):
+                _id = str(_id)
+                self._remove_locked(_id)
+
+                ids_list = self._list_ids[list_no]
+                if len(ids_list) == len(self._vectors[list_no]):
+                    grown = np.empty((max(16, 2 * len(ids_list)), self.DIM), dtype=np.float32)
+                    grown[:len(ids_list)] = self._vectors[list_no]
+                    self._vectors[list_no] = grown
+
+                self._vectors[list_no][len(ids_list)] = vector
+                self._where[_id] = (int(list_no), len(ids_list))
+                ids_list.append(_id)
+
+    def remove(self, _id: str) -> None:
+        with self._lock:
+            self._remove_locked(str(_id))
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+    def query(self, vector, k: int, nprobe: Optional[int] = None) -> List[Tuple[str, float]]:
+        """Top `k` (_id, cosine similarity) pairs among the `nprobe` nearest lists."""
+        if not self.trained or len(self) == 0:
+            return []
+        query = self._normalize(np.asarray(vector, dtype=np.float32).reshape(self.DIM))
+
+        with self._lock:
+            probe = top_k(self.centroids @ query, nprobe or self.nprobe).indices
+            ids = [_id for list_no in probe for _id in self._list_ids[list_no]]
+            scores = np.concatenate([
+                self._vectors[list_no][:len(self._list_ids[list_no])] @ query
+                for list_no in probe
+            ])
+
+        best = top_k(scores, k)
+        return [(ids[i], float(score)) for i, score in zip(best.indices, best.scores)]
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+    def save(self) -> None:
+        if not self.trained:
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._lock:
+            sizes = self.list_sizes()
+            with open(self.path, "wb") as f:
+                np.savez(
+                    f,
+                    centroids=self.centroids,
+                    sizes=sizes,
+                    vectors=np.concatenate([v[:n] for v, n in zip(self._vectors, sizes)]),
+                    ids=np.asarray([_id for ids in self._list_ids for _id in ids], dtype="S24"),
+                )
+        logger.info(f"Saved IVF index with {len(self)} vectors to {self.path}")
+
+    def load(self) -> bool:
+        if not os.path.exists(self.path):
+            return False
+        data = np.load(self.path)
+        offsets = np.concatenate([[0], np.cumsum(data["sizes"])])
+        ids = [_id.decode() for _id in data["ids"]]
+
+        with self._lock:
+            self.centroids = data["centroids"]
+            self._vectors = [data["vectors"][start:stop].copy()
+                             for start, stop in zip(offsets[:-1], offsets[1:])]
+            self._list_ids = [ids[start:stop] for start, stop in zip(offsets[:-1], offsets[1:])]
+            self._where = {_id: (list_no, position)
+                           for list_no, list_ids in enumerate(self._list_ids)
+                           for position, _id in enumerate(list_ids)}
+        logger.info(f"Loaded IVF index with {len(self)} vectors from {self.path}")
+        return True
+
+    def empty_like(self, quantizer: bool = False) -> "IVFIndex":
+        """A new, empty index; with `quantizer` it reuses this one's trained centroids."""
+        index = IVFIndex(self.path, nlist=self.nlist, nprobe=self.nprobe)
+        if quantizer and self.trained:
+            index._reset(self.centroids)
+        return index
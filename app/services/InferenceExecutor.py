@@ -0,0 +1,93 @@
+import asyncio
+import multiprocessing
+import sys
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, List, Optional
+import numpy as np
+from app.config.logger import logger
+from app.utils.metrics import Gauge, Histogram, labels
+
+ENCODE_SECONDS = Histogram("inference_encode_seconds", "Wall time of one encode call, queueing included",
+                           (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10))
+
+
+def _init_worker(load_model: Callable, torch_threads: int) -> None:
+    load_model()
+    # Cap intra-op threads so encoding leaves cores to the event loop and scoring;
+    # the ONNX backend sets its own on the session and may not load torch at all
+    torch = sys.modules.get("torch")
+    if torch is not None and torch_threads > 0:
+        torch.set_num_threads(torch_threads)
+
+
+def _encode(load_model: Callable, texts: List[str], batch_size: int, normalize_embeddings: bool) -> np.ndarray:
+    return np.asarray(load_model().encode(
+        texts, batch_size=batch_size, normalize_embeddings=normalize_embeddings), dtype=np.float32)
+
+
+class InferenceExecutor:
+    """
+    Runs the synchronous `SentenceTransformer.encode` off the event loop.
+
+    "thread" mode shares the process' model across a small thread pool
+    (torch releases the GIL inside its kernels); "process" mode loads one
+    model per worker process. At most `max_pending` encode calls are
+    submitted at once, later callers wait, so a burst of events cannot queue
+    unbounded work behind HTTP requests.
+    """
+
+    def __init__(self, load_model: Callable, workers: int = 1, mode: str = "thread",
+                 torch_threads: int = 0, max_pending: int = 64):
+        self.load_model = load_model
+        self.workers = max(1, workers)
+        self.mode = mode
+        self.torch_threads = torch_threads
+        self.max_pending = max_pending
+        self._pool: Optional[Executor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._waiting = 0
+        Gauge("inference_waiting", "Encode calls waiting for a free slot",
+              collect=lambda: {labels(): self._waiting})
+
+    def _get_pool(self) -> Executor:
+        if self._pool is None:
+            initargs = (self.load_model, self.torch_threads)
+            if self.mode == "process":
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                    initargs=initargs,
+                )
+            else:
+                self._pool = ThreadPoolExecutor(
+                    max_workers=self.workers, initializer=_init_worker, initargs=initargs)
+            logger.info(f"Started {self.workers} {self.mode} inference workers")
+        return self._pool
+
+    async def encode(self, texts: List[str], batch_size: int = 32,
+                     normalize_embeddings: bool = False) -> np.ndarray:
+        """(len(texts), dim) float32 embeddings, computed in the pool."""
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_pending)
+
+        started = time.perf_counter()
+        self._waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self._waiting -= 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                self._get_pool(), _encode, self.load_model, list(texts), batch_size, normalize_embeddings)
+        finally:
+            self._slots.release()
+            ENCODE_SECONDS.observe(time.perf_counter() - started, mode=self.mode)
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
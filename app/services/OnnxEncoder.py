@@ -0,0 +1,123 @@
+import json
+import os
+from typing import List
+import numpy as np
+from app.config.logger import logger
+
+MODEL_FILE = "model_int8.onnx"
+CONFIG_FILE = "encoder.json"
+
+
+def export_onnx(model_name: str, directory: str, opset: int = 17) -> str:
+    """
+    Export a mean-pooling SentenceTransformer's transformer to ONNX and
+    quantize its weights to int8 (dynamic quantization: activations stay
+    float and are quantized per batch at run time). Needs torch, so it runs
+    once at build or first start, never on the serving path.
+    """
+    import torch
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    from sentence_transformers import SentenceTransformer
+
+    model = SentenceTransformer(model_name, device="cpu")
+    pooling = model[1]
+    if not getattr(pooling, "pooling_mode_mean_tokens", False):
+        raise ValueError(f"{model_name} does not use mean pooling, which OnnxEncoder assumes")
+
+    os.makedirs(directory, exist_ok=True)
+    transformer = model[0].auto_model.eval()
+    model.tokenizer.save_pretrained(directory)
+
+    sample = model.tokenizer(["export"], return_tensors="pt")
+    inputs = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+    float_path = os.path.join(directory, "model.onnx")
+    axes = {0: "batch", 1: "sequence"}
+    with torch.no_grad():
+        torch.onnx.export(
+            transformer,
+            tuple(sample[name] for name in inputs),
+            float_path,
+            input_names=inputs,
+            output_names=["last_hidden_state"],
+            dynamic_axes={**{name: axes for name in inputs}, "last_hidden_state": axes},
+            opset_version=opset,
+        )
+
+    quantized_path = os.path.join(directory, MODEL_FILE)
+    quantize_dynamic(float_path, quantized_path, weight_type=QuantType.QInt8)
+    os.remove(float_path)
+
+    with open(os.path.join(directory, CONFIG_FILE), "w") as f:
+        json.dump({"model": model_name, "max_seq_length": model.max_seq_length,
+                   "dimension": model.get_sentence_embedding_dimension()}, f)
+    logger.info(f"Exported int8 ONNX model for {model_name} to {directory}")
+    return quantized_path
+
+
+class OnnxEncoder:
+    """
+    `SentenceTransformer.encode`-compatible encoder over an int8 ONNX export:
+    tokenize, run the transformer in onnxruntime, mean-pool over the
+    attention mask and L2-normalize. The torch pipeline ends in a Normalize
+    module, so its output is unit length whatever `normalize_embeddings`
+    says, and this one is too.
+    """
+
+    def __init__(self, directory: str, intra_op_threads: int = 0):
+        import onnxruntime
+        from tokenizers import Tokenizer
+
+        with open(os.path.join(directory, CONFIG_FILE)) as f:
+            config = json.load(f)
+        self.max_seq_length = config["max_seq_length"]
+        self.dimension = config["dimension"]
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(directory, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=self.max_seq_length)
+        pad_id = self.tokenizer.token_to_id("[PAD]") or 0
+        self.tokenizer.enable_padding(pad_id=pad_id, pad_token=self.tokenizer.id_to_token(pad_id))
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.execution_mode = onnxruntime.ExecutionMode.ORT_SEQUENTIAL
+        options.inter_op_num_threads = 1
+        if intra_op_threads > 0:
+            options.intra_op_num_threads = intra_op_threads
+        self.session = onnxruntime.InferenceSession(
+            os.path.join(directory, MODEL_FILE), options, providers=["CPUExecutionProvider"])
+        self.inputs = [node.name for node in self.session.get_inputs()]
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dimension
+
+    def _embed(self, texts: List[str]) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(texts)
+        features = {
+            "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+            "attention_mask": np.array([e.attention_mask for e in encodings], dtype=np.int64),
+            "token_type_ids": np.array([e.type_ids for e in encodings], dtype=np.int64),
+        }
+        hidden = self.session.run(None, {name: features[name] for name in self.inputs})[0]
+        mask = features["attention_mask"][..., None].astype(np.float32)
+        return (hidden * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+
+    def encode(self, sentences, batch_size: int = 32, normalize_embeddings: bool = False,
+               **kwargs) -> np.ndarray:
+        """
+        Same shapes as `SentenceTransformer.encode`: (dim,) for a string, (n, dim)
+        for a list. Output is always unit length; `normalize_embeddings` is
+        accepted for compatibility only.
+        """
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        embeddings = np.empty((len(texts), self.dimension), dtype=np.float32)
+
+        # Longest first, so each batch pads to similar lengths
+        order = sorted(range(len(texts)), key=lambda i: -len(texts[i]))
+        for start in range(0, len(order), batch_size):
+            batch = order[start:start + batch_size]
+            embeddings[batch] = self._embed([texts[i] for i in batch])
+
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        embeddings /= np.where(norms == 0, 1, norms)
+        return embeddings[0] if single else embeddings
@@ -0,0 +1,111 @@
+import asyncio
+from typing import Dict, List, Optional
+from bson import ObjectId
+from cachetools import TTLCache
+from app.config.db import db
+from app.config.env import PROFILE_CACHE_USERS, PROFILE_CACHE_TTL, PROFILE_BATCH_SIZE
+from app.config.logger import logger
+from app.utils.metrics import Counter
+from .FeatureStore import FeatureStore
+
+REQUESTS = Counter("profile_cache_requests_total", "Query-side profile lookups by result")
+BATCHES = Counter("profile_cache_batches_total", "$in queries issued for profile cache misses")
+
+
+class ProfileCache:
+    """
+    Query-side fields of users, the ones a recommendation call reads about
+    the user asking for it.
+
+    Misses are batched DataLoader-style: every miss in the same event-loop
+    tick joins one pending batch, loaded with a single `$in` query. Entries
+    are refreshed from embed and profile events and expire after a TTL so
+    writes that bypass those events are picked up too.
+    """
+
+    PROJECTION = {"embedding": 1, "embeddingNormalized": 1, **FeatureStore.PROJECTION}
+
+    user_collection = db["users"]
+    _profiles: TTLCache = TTLCache(maxsize=PROFILE_CACHE_USERS, ttl=PROFILE_CACHE_TTL)
+    _queued: Dict[str, asyncio.Future] = {}    # misses waiting for the next batch
+    _loading: Dict[str, asyncio.Future] = {}   # misses in a batch whose query is running
+
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+    @classmethod
+    async def get(cls, user_id: str) -> Optional[dict]:
+        """
+        A copy of the user's query-side fields, or None if there is no such user.
+        Raises InvalidId for a malformed id, before it can join a shared batch.
+        """
+        user_id = str(ObjectId(user_id))
+        profile = cls._profiles.get(user_id)
+        if profile is not None:
+            REQUESTS.inc(result="hit")
+            return dict(profile)
+
+        REQUESTS.inc(result="miss")
+        future = cls._loading.get(user_id) or cls._queued.get(user_id)
+        if future is None:
+            future = cls._queued[user_id] = asyncio.get_running_loop().create_future()
+            if len(cls._queued) == 1:
+                # First miss of this tick: let the others queue up before loading
+                asyncio.get_running_loop().call_soon(cls._dispatch)
+            elif len(cls._queued) >= PROFILE_BATCH_SIZE:
+                cls._dispatch()
+        profile = await asyncio.shield(future)
+        return None if profile is None else dict(profile)
+
+    @classmethod
+    async def get_many(cls, user_ids: List[str]) -> Dict[str, Optional[dict]]:
+        profiles = await asyncio.gather(*[cls.get(_id) for _id in user_ids])
+        return dict(zip(map(str, user_ids), profiles))
+
+    @classmethod
+    def _dispatch(cls) -> None:
+        if not cls._queued:
+            return
+        batch, cls._queued = cls._queued, {}
+        cls._loading.update(batch)
+        asyncio.ensure_future(cls._load(batch))
+
+    @classmethod
+    async def _load(cls, batch: Dict[str, asyncio.Future]) -> None:
+        BATCHES.inc()
+        try:
+            cursor = cls.user_collection.find(
+                {"_id": {"$in": [ObjectId(_id) for _id in batch]}}, cls.PROJECTION)
+            found = {str(doc['_id']): doc for doc in await cursor.to_list()}
+            for _id, future in batch.items():
+                profile = found.get(_id)
+                if profile is not None:
+                    cls._profiles[_id] = profile
+                if not future.done():
+                    future.set_result(profile)
+        except Exception as e:
+            logger.error(f"Failed to load {len(batch)} profiles: {e}")
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(e)
+        finally:
+            for _id, future in batch.items():
+                if cls._loading.get(_id) is future:
+                    del cls._loading[_id]
+
+    # ------------------------------------------------------------------
+    # Updates from events
+    # ------------------------------------------------------------------
+    @classmethod
+    def update(cls, user_id: str, fields: dict) -> None:
+        """Merge changed query-side fields into a cached profile; uncached users load on their next read."""
+        user_id = str(user_id)
+        profile = cls._profiles.get(user_id)
+        if profile is None:
+            return
+        changed = {key: value for key, value in fields.items() if key in cls.PROJECTION}
+        cls._profiles[user_id] = {**profile, **changed}
+
+    @classmethod
+    def invalidate(cls, user_id: str) -> None:
+        cls._profiles.pop(str(user_id), None)
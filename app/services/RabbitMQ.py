@@ -1,11 +1,124 @@
+import asyncio
 import json
-from typing import Dict, Optional, Any
+import time
+from typing import Dict, List, Optional, Any, Set, Tuple
 import aio_pika
 from aio_pika import ExchangeType, Message
 from app.config.env import RABBITMQ_URL
 from app.config.logger import logger
 from app.config.queues import QUEUES
 from app.constants import QueueName
+from app.types import QueueConfig
+from app.utils.metrics import Histogram
+
+BATCH_SIZE = Histogram("rabbitmq_batch_size", "Messages per flushed consumer batch",
+                       (1, 2, 4, 8, 16, 32, 64, 128, 256))
+BATCH_LATENCY = Histogram("rabbitmq_batch_latency_seconds",
+                          "Time from a batch's first delivery until it is acked",
+                          (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30))
+
+
+def decode_message(queue_name: QueueName, message: aio_pika.IncomingMessage) -> Tuple[str, dict]:
+    """(event type, message body) of a delivery; ValueError if no handler is routed for it."""
+    payload = json.loads(message.body.decode())
+    event_type = payload.get("eventType")
+    if not event_type or event_type not in QUEUES[queue_name].handlers:
+        logger.error(f"Unknown event_type: {event_type} in {queue_name}")
+        raise ValueError(f"Unknown event_type: {event_type}")
+    return event_type, payload
+
+
+class BatchConsumer:
+    """
+    Buffers deliveries up to `batch_size` messages or `batch_window_ms`, then
+    handles them in arrival order. Each run of consecutive events that has a
+    batch handler goes to it in one call, everything else to its single-event
+    handler. If a batch handler fails, its run is retried one event at a time,
+    so a poison message dead-letters alone.
+    """
+
+    def __init__(self, queue_name: QueueName, config: QueueConfig, io: Any = None):
+        self.queue_name = queue_name
+        self.config = config
+        self.io = io
+        self._pending: List[aio_pika.IncomingMessage] = []
+        self._started = 0.0
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._lock = asyncio.Lock()        # one flush at a time, so acks can be cumulative
+        self._flushes: Set[asyncio.Task] = set()
+
+    async def on_message(self, message: aio_pika.IncomingMessage) -> None:
+        if not self._pending:
+            self._started = time.perf_counter()
+            self._timer = asyncio.get_running_loop().call_later(
+                self.config.batch_window_ms / 1000, self._cut)
+        self._pending.append(message)
+        if len(self._pending) >= self.config.batch_size:
+            self._cut()
+
+    def _cut(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, []
+        task = asyncio.ensure_future(self._flush(batch, self._started))
+        self._flushes.add(task)
+        task.add_done_callback(self._flushes.discard)
+
+    async def _handle_one(self, event_type: str, payload: dict) -> bool:
+        try:
+            await self.config.handlers[event_type](payload, self.io)
+            return True
+        except Exception as err:
+            logger.error(f"Error processing message on {self.queue_name}: {err}")
+            return False
+
+    async def _flush(self, batch: List[aio_pika.IncomingMessage], started: float) -> None:
+        async with self._lock:
+            done, failed = [], []
+            runs: List[Tuple[str, list]] = []     # (event type, [(message, payload)]) in arrival order
+            for message in batch:
+                try:
+                    event_type, payload = decode_message(self.queue_name, message)
+                except Exception as err:
+                    logger.error(f"Error processing message on {self.queue_name}: {err}")
+                    failed.append(message)
+                    continue
+                if runs and runs[-1][0] == event_type:
+                    runs[-1][1].append((message, payload))
+                else:
+                    runs.append((event_type, [(message, payload)]))
+
+            for event_type, run in runs:
+                logger.info(f"📥 Received {len(run)} on {self.queue_name}, event type - {event_type}")
+                batch_handler = self.config.batch_handlers.get(event_type)
+                if batch_handler is not None:
+                    try:
+                        await batch_handler([payload for _, payload in run], self.io)
+                        done += [message for message, _ in run]
+                        continue
+                    except Exception as err:
+                        logger.error(f"Batch of {len(run)} {event_type} failed on {self.queue_name}, "
+                                     f"retrying one by one: {err}")
+                for message, payload in run:
+                    (done if await self._handle_one(event_type, payload) else failed).append(message)
+
+            try:
+                if failed:
+                    for message in done:
+                        await message.ack()
+                    for message in failed:
+                        await message.reject(requeue=False)
+                elif done:
+                    # Earlier batches are all settled, so one cumulative ack covers this one
+                    await max(done, key=lambda message: message.delivery_tag).ack(multiple=True)
+            except Exception as err:
+                logger.error(f"Failed to ack batch on {self.queue_name}: {err}")
+
+            BATCH_SIZE.observe(len(batch), queue=self.queue_name.value)
+            BATCH_LATENCY.observe(time.perf_counter() - started, queue=self.queue_name.value)
 
 
 class RabbitMQ:
@@ -69,13 +182,14 @@ class RabbitMQ:
                 routing_key=QUEUES[queue_name].routing_key_pattern
             )
 
-            # Set prefetch limit
-            await channel.set_qos(prefetch_count=cls.PREFETCH_COUNT)
+            # Set prefetch limit; a batched queue needs a whole batch in flight
+            prefetch = max(cls.PREFETCH_COUNT, QUEUES[queue_name].batch_size)
+            await channel.set_qos(prefetch_count=prefetch)
 
             logger.info(
                 f"Channel created for queue: {queue_name}, "
                 f"bound to {QUEUES[queue_name].exchange} with pattern {QUEUES[queue_name].routing_key_pattern}, "
-                f"prefetch: {cls.PREFETCH_COUNT}, DLX: {dlx_name}, DLQ: {dlq_name}"
+                f"prefetch: {prefetch}, DLX: {dlx_name}, DLQ: {dlq_name}"
             )
 
         return cls._channels[queue_name]
@@ -112,15 +226,7 @@ class RabbitMQ:
                 try:
                     # Use process context manager to handle ack/reject automatically
                     async with message.process(requeue=False):
-                        payload = json.loads(message.body.decode())
-                        event_type = payload.get("eventType")
-                        data = payload.get("payload")
-
-                        if not event_type or event_type not in QUEUES[queue_name].handlers:
-                            logger.error(
-                                f"Unknown event_type: {event_type} in {queue_name}")
-                            raise ValueError(
-                                f"Unknown event_type: {event_type}")
+                        event_type, payload = decode_message(queue_name, message)
 
                         logger.info(
                             f"📥 Received on {queue_name}, event type - {event_type}")
@@ -130,6 +236,9 @@ class RabbitMQ:
                         f"Error processing message on {queue_name}: {err}")
                     # No need to reject manually; message.process handles it on exception
 
+            if QUEUES[queue_name].batch_size > 1:
+                on_message = BatchConsumer(queue_name, QUEUES[queue_name], io).on_message
+
             queue = await channel.get_queue(QUEUES[queue_name].name)
             await queue.consume(on_message)
             logger.info(f"Consumer started for {queue_name}")
@@ -1,14 +1,77 @@
+import asyncio
+import secrets
+import numpy as np
+from datetime import datetime, timedelta, timezone
+from typing import List
 from app.config.db import db
 from bson import ObjectId
+from cachetools import TTLCache
+from pymongo import ReplaceOne
 from .AI import AI
+from .EmbeddingStore import EmbeddingStore
+from .FeatureStore import FeatureStore
+from .ProfileCache import ProfileCache
+from .SeenSet import SeenSet
+from .SegmentedIndex import SegmentedIndex
+from .SuggestionCache import SuggestionCache
 from app.config.ai import get_model
+from app.config.index import (
+    get_index, set_index, get_store, get_search_index, get_ivf, set_ivf, get_executor, get_geo,
+    get_features, get_segments, set_segments, new_segments
+)
+from app.config.env import (
+    IVF_TRAIN_SAMPLE, SUGGESTIONS_SIZE, SUGGESTIONS_TTL,
+    SUGGESTION_PAGE_DEPTH, SUGGESTION_PAGE_TTL, SUGGESTION_PAGE_CACHE_USERS,
+    DISTANCE_WEIGHT, DISTANCE_SCALE_KM, SEARCH_BACKEND, SEGMENTED_INDEX, RERANK_DEPTH
+)
+from app.config.logger import logger
+from app.utils.bson_vector import decode_vector, decode_vectors
+from app.utils.geo import coordinates, distance_penalty
+from app.utils.topk import top_k
+from app.utils.page_cursor import CursorExpired, decode_cursor, encode_cursor
+from app.utils.single_flight import SingleFlight
 
 
 
 class Recommendation:
 
     user_collection = db["users"]
+    suggestion_collection = db["suggestions"]
     ai = AI()
+    ANN_OVERFETCH = 3  # ANN hits fetched per requested match, before filtering
+    # user_id -> (ranking_id, ranked matches) behind paginated suggestions
+    _rankings: TTLCache = TTLCache(maxsize=SUGGESTION_PAGE_CACHE_USERS, ttl=SUGGESTION_PAGE_TTL)
+    # Concurrent identical requests (client retries, several devices) share one computation
+    _flights = SingleFlight("recommend")
+    _nearby_flights = SingleFlight("recommend_nearby")
+
+    MATCH_PROJECTION = {
+        "_id": 1,
+        "firstName": {"$ifNull": ["$firstName", None]},
+        "lastName":  {"$ifNull": ["$lastName",  None]},
+        "gender": 1,
+        "dateOfBirth": 1,
+        "height": 1,
+        "photo": {"$ifNull": ["$photo", None]},
+        "location": 1,
+        "age": 1,                     # already calculated field?
+        "score": 1,
+        "hobbies": 1,
+        "interests": 1,
+        "pets": "$pets",
+        "favoriteColors": 1,
+        "spokenLanguages": 1,
+    }
+
+    VECTOR_PROJECTIONS = {
+        "float": {"embedding": 1, "embeddingNormalized": 1},
+        "int8": {
+            "embeddingQ": 1,
+            "embeddingNormalized": 1,
+            "embedding": {"$cond": [{"$ifNull": ["$embeddingQ", False]}, "$$REMOVE", "$embedding"]},
+        },
+        None: {},
+    }
 
     @classmethod
     async def get_all_users(cls, batch_size: int = 100):
@@ -18,12 +81,15 @@ class Recommendation:
 
     @classmethod
     async def possible_matches_location(cls, user_id: str, max_distance_km: int, limit: int):
-        user = await cls.user_collection.find_one({'_id': ObjectId(user_id)})
+        user = await ProfileCache.get(user_id)
         coordinates = user.get("location", {}).get("coordinates")
         gender = user.get("gender", {})
         batchSize = limit * 3
         page = 1
         skip = (page - 1) * batchSize
+        seen = await SeenSet.get(user_id)
+        # Liked users are masked out afterwards, so fetch enough to survive that
+        fetch = batchSize + len(seen)
 
 
         pipeline = [
@@ -42,46 +108,35 @@ class Recommendation:
                     }
                 }
             },
-            {
-                "$lookup": {
-                    "from": "likehistories",
-                    "let": {"userId": "$_id"},
-                    "pipeline": [
-                        {
-                            "$match": {
-                                "$expr": {
-                                    "$and": [
-                                        # Reference user who liked
-                                        {"$eq": ["$userId",
-                                                 ObjectId(user_id)]},
-                                        # User from outer query
-                                        {"$eq": ["$likedUserId", "$$userId"]}
-                                    ]
-                                }
-                            }
-                        }
-                    ],
-                    "as": "likeHistory"
-                }
-            },
-            # Exclude users with matching like history
-            {"$match": {"likeHistory": {"$size": 0}}},
-            {"$project": {"_id": 1}},
-            {"$limit": batchSize},
-            {"$sample": {"size": skip + batchSize}}
+            {"$project": {"_id": 1, "distance": 1}},
+            {"$limit": fetch},
+            {"$sample": {"size": skip + fetch}}
 
         ]
 
         cursor = cls.user_collection.aggregate(pipeline)
-        return [dict(user, _id=str(user['_id'])) for user in await cursor.to_list()]
+        return [dict(user, _id=str(user['_id']))
+                async for user in SeenSet.exclude(seen, cursor, batchSize)]
     
     @classmethod
-    async def possible_matches(cls, user_id: str, limit: int):
-        user = await cls.user_collection.find_one({'_id': ObjectId(user_id)})
+    async def possible_matches_cursor(cls, user_id: str, limit: int, vectors: str | None = "float",
+                                      profiles: bool = True):
+        """
+        The query user and an un-drained cursor over their candidate matches.
+
+        `vectors` picks the embedding shipped with each candidate: "float",
+        "int8" (`embeddingQ` where present, instead of the much larger float
+        `embedding`) or None. Without `profiles` only `_id` and the vector come
+        back, for callers that hydrate the final winners themselves.
+        """
+        user = await ProfileCache.get(user_id)
         gender = user.get("gender", {})
         batchSize = limit * 3
         page = 1
         skip = (page - 1) * batchSize
+        seen = await SeenSet.get(user_id)
+        # Liked users are masked out of the cursor, so fetch enough to survive that
+        fetch = batchSize + len(seen)
 
         pipeline = [
             {
@@ -91,73 +146,624 @@ class Recommendation:
                     **({"genderInterest": gender} if gender else {})
                 }
             },
-            {
-                "$lookup": {
-                    "from": "likehistories",
-                    "let": {"userId": "$_id"},
-                    "pipeline": [
-                        {
-                            "$match": {
-                                "$expr": {
-                                    "$and": [
-                                        # Reference user who liked
-                                        {"$eq": ["$userId",
-                                                 ObjectId(user_id)]},
-                                        # User from outer query
-                                        {"$eq": ["$likedUserId", "$$userId"]}
-                                    ]
-                                }
-                            }
-                        }
-                    ],
-                    "as": "likeHistory"
-                }
-            },
-            # Exclude users with matching like history
-            {"$match": {"likeHistory": {"$size": 0}}},
             {"$project": {
-                "_id": 1,
-                "firstName": {"$ifNull": ["$firstName", None]},
-                "lastName":  {"$ifNull": ["$lastName",  None]},
-                "gender": 1,
-                "dateOfBirth": 1,
-                "height": 1,
-                "photo": {"$ifNull": ["$photo", None]},
-                "location": 1,
-                "age": 1,                     # already calculated field?
-                "score": 1,
-                "hobbies": 1,
-                "interests": 1,
-                "pets": "$pets",
-                "favoriteColors": 1,
-                "spokenLanguages": 1,
-                "embedding": 1
+                **(cls.MATCH_PROJECTION if profiles else {"_id": 1}),
+                **cls.VECTOR_PROJECTIONS[vectors],
             }},
-            {"$limit": batchSize},
-            {"$sample": {"size": skip + batchSize}}
+            {"$limit": fetch},
+            {"$sample": {"size": skip + fetch}}
 
         ]
 
         cursor = cls.user_collection.aggregate(pipeline)
         user['_id'] = str(user['_id'])
+        return user, SeenSet.exclude(seen, cursor, batchSize)
+
+    @classmethod
+    async def possible_matches(cls, user_id: str, limit: int, vectors: str | None = "float",
+                               profiles: bool = True):
+        user, cursor = await cls.possible_matches_cursor(user_id, limit, vectors, profiles)
         return {
             "user": user,
-            "matches": [dict(user, _id=str(user['_id'])) for user in await cursor.to_list()]
+            "matches": [dict(user, _id=str(user['_id'])) async for user in cursor]
         }
 
     @classmethod
-    async def recommend(cls,user_id:str, limit: int=20):
-        result = await cls.possible_matches(user_id, limit)
-        matches = result['matches']
-        query_embedding_arr = result['user']['embedding']
+    async def hydrate(cls, ids: List[str], query: dict | None = None) -> List[dict]:
+        """Load profile fields for `ids` in one $in query, keeping the order of `ids`."""
+        if not ids:
+            return []
+        cursor = cls.user_collection.find(
+            {"_id": {"$in": [ObjectId(_id) for _id in ids]}, **(query or {})},
+            cls.MATCH_PROJECTION
+        )
+        docs = {str(doc['_id']): dict(doc, _id=str(doc['_id']))
+                for doc in await cursor.to_list()}
+        return [docs[_id] for _id in ids if _id in docs]
+
+    @classmethod
+    async def search_index(cls, index, vector, k: int, mask=None, user: dict | None = None) -> List[tuple]:
+        """
+        Query the search backend without blocking the event loop. The exact
+        backend skips rows where `mask` is False; graph and IVF hits are
+        returned unfiltered, see `passing`. A segmented index only visits the
+        segments compatible with `user`.
+        """
+        if index is get_store():
+            # Exact scans are sharded across the scoring pool
+            return await get_executor().query(vector, k, mask=mask)
+        if isinstance(index, SegmentedIndex):
+            return await asyncio.to_thread(
+                index.query, vector, k, None if user is None else index.compatible(user))
+        # hnswlib and numpy release the GIL while they search
+        return await asyncio.to_thread(index.query, vector, k)
+
+    @staticmethod
+    def passing(ids: List[str], mask) -> List[str]:
+        """The `ids` whose embedding-store row passes `mask` (all of them without one)."""
+        if mask is None:
+            return ids
+        store = get_store()
+        rows = [store.row(_id) for _id in ids]
+        return [_id for _id, row in zip(ids, rows) if row is not None and row < len(mask) and mask[row]]
+
+    @staticmethod
+    def blend(user: dict, ids: List[str], similarities) -> List[str]:
+        """
+        `ids` re-ordered by cosine similarity minus the distance penalty from
+        `user`, with distances from the feature columns in one haversine pass.
+        Order is kept when distance can't be used.
+        """
+        features, point = get_features(), coordinates(user.get("location"))
+        if not ids or DISTANCE_WEIGHT == 0 or point is None or not features.ready:
+            return ids
+        store = get_store()
+        rows = [store.row(_id) for _id in ids]
+        distances = features.distances(*point, [-1 if row is None else row for row in rows])
+        scores = np.asarray(similarities) - distance_penalty(distances, DISTANCE_WEIGHT, DISTANCE_SCALE_KM)
+        return [ids[i] for i in np.argsort(-scores, kind="stable")]
+
+    @classmethod
+    async def hard_filters(cls, user: dict):
+        """
+        (mask, query): the feature-store mask of rows `user` may be shown and the
+        Mongo filter still needed on top of it. Without loaded feature columns
+        the mask is None and the Mongo filter does the work. The mask covers
+        every row, so it is computed off the event loop.
+        """
+        features = get_features()
+        if features.ready:
+            return await asyncio.to_thread(features.mask, user), None
+        gender = user.get("gender", {})
+        return None, {
+            "status": "active",
+            **({"genderInterest": gender} if gender else {})
+        }
+
+    @classmethod
+    async def recommend_indexed(cls, user_id: str, limit: int = 20):
+        user = await ProfileCache.get(user_id)
+        if not user or not user.get("embedding"):
+            return []
+
+        mask, query = await cls.hard_filters(user)
+        index = get_search_index()
+        seen = await SeenSet.get(user_id)
+        fetch = limit * cls.ANN_OVERFETCH
+        visited = {user_id}
+        matches = []
+
+        # Widen the ANN search until enough hits survive the Mongo-side filters
+        while True:
+            hits = dict(await cls.search_index(index, decode_vector(user['embedding']), fetch, mask, user))
+            new = [_id for _id in hits if _id not in visited]
+            visited.update(new)
+
+            fresh = SeenSet.unseen(seen, cls.passing(new, mask))
+            matches += await cls.hydrate(cls.blend(user, fresh, [hits[_id] for _id in fresh]), query)
+
+            # IVF only ever returns hits from its probed lists, so stop once nothing new shows up;
+            # a round whose new hits were all filtered out still widens
+            if len(matches) >= limit or fetch >= len(index) or not new:
+                break
+            fetch *= 4
+
+        return matches[:limit]
+
+    @classmethod
+    async def recommend(cls, user_id: str, limit: int = 20):
+        cached = SuggestionCache.get(user_id, limit)
+        if cached is not None:
+            return cached
+
+        generation = SuggestionCache.generation()
 
-        return cls.ai.search(query_embedding_arr, matches)
+        async def compute():
+            matches = await cls.rank(user_id, limit)
+            SuggestionCache.put(user_id, limit, matches, generation)
+            return matches
+
+        # A request made after an invalidation starts its own flight rather than joining one that predates it
+        key = (user_id, limit, SuggestionCache.invalidated_at(user_id))
+        return list(await cls._flights.do(key, compute))
 
     @classmethod
-    async def compute_suggestions(cls, batch_size=100):
+    async def rank(cls, user_id: str, limit: int = 20):
+        precomputed = await cls.precomputed_suggestions(user_id, limit)
+        if precomputed is not None:
+            return precomputed
+
+        if len(get_search_index()) > 0:
+            return await cls.recommend_indexed(user_id, limit)
+
+        store = get_store()
+        if len(store) == 0:
+            # Nothing in process yet: stream ids + int8 codes and keep a shortlist,
+            # then re-score only the shortlist with float vectors
+            user, cursor = await cls.possible_matches_cursor(user_id, limit, vectors="int8", profiles=False)
+            query_embedding_arr = decode_vector(user['embedding'])
+            query_normalized = bool(user.get('embeddingNormalized'))
+            shortlist = await cls.ai.search_cursor(
+                query_embedding_arr, cursor, top_k=max(limit, RERANK_DEPTH), query_normalized=query_normalized)
+            matches = await cls.with_missing_vectors(shortlist, store, vectors="float")
+            best = await asyncio.to_thread(
+                cls.ai.search, query_embedding_arr, matches, top_k=limit, query_normalized=query_normalized)
+            return await cls.hydrate([match['_id'] for match in best])
+
+        # Phase one: candidate ids only, vectors come from the store
+        result = await cls.possible_matches(user_id, limit, vectors=None, profiles=False)
+        matches = await cls.with_missing_vectors(result['matches'], store)
+        query_embedding_arr = decode_vector(result['user']['embedding'])
+
+        best = await asyncio.to_thread(
+            cls.ai.search, query_embedding_arr, matches, top_k=limit, store=store,
+            query_normalized=bool(result['user'].get('embeddingNormalized')))
+        # Phase two: profile fields for the winners only
+        return await cls.hydrate([match['_id'] for match in best])
+
+    @classmethod
+    async def with_missing_vectors(cls, matches: List[dict], store, vectors: str = "int8") -> List[dict]:
+        """
+        Attach a vector to the candidates the store does not hold yet: by
+        default the compact `embeddingQ`, which `AI.search` scores in its int8
+        first pass, or the float `embedding` with `vectors="float"`.
+        """
+        missing = [match['_id'] for match in matches if match['_id'] not in store]
+        if not missing:
+            return matches
         cursor = cls.user_collection.find(
-            {}, {"_id": 1, "location": 1, "gender": 1}).batch_size(batch_size)
-        
+            {"_id": {"$in": [ObjectId(_id) for _id in missing]}},
+            cls.VECTOR_PROJECTIONS[vectors]
+        )
+        docs = {str(doc['_id']): doc for doc in await cursor.to_list()
+                if doc.get('embedding') or doc.get('embeddingQ')}
+        return [dict(docs[match['_id']], _id=match['_id']) if match['_id'] in docs else match
+                for match in matches]
+
+    @classmethod
+    async def recommend_nearby(cls, user_id: str, max_distance_km: float, limit: int = 20):
+        """
+        Best `limit` matches within `max_distance_km`, each with its `distance`
+        in meters, ranked by cosine similarity minus the distance penalty.
+        Candidates come from the geo grid, else from one pass over the feature
+        columns, and only until either is built from `$geoNear`.
+        """
+        return list(await cls._nearby_flights.do(
+            (user_id, max_distance_km, limit), lambda: cls.rank_nearby(user_id, max_distance_km, limit)))
+
+    @classmethod
+    async def rank_nearby(cls, user_id: str, max_distance_km: float, limit: int = 20):
+        user = await ProfileCache.get(user_id)
+        point = coordinates(user.get("location")) if user else None
+        if not user or not user.get("embedding") or point is None:
+            return []
+
+        geo, store, features = get_geo(), get_store(), get_features()
+        mask, query = await cls.hard_filters(user)
+        if len(geo) > 0:
+            ids, distances = geo.within(*point, max_distance_km)
+        elif features.ready:
+            # Radius and hard filters in one vectorized pass over the columns, off the event loop
+            def within():
+                distances = features.distances(*point)
+                rows = np.flatnonzero(mask & (distances <= max_distance_km))
+                return rows, distances[rows]
+
+            rows, distances = await asyncio.to_thread(within)
+            ids = [store.id_at(row) for row in rows]
+        else:
+            nearby = await cls.possible_matches_location(user_id, max_distance_km, limit)
+            ids, distances = [doc['_id'] for doc in nearby], [doc['distance'] / 1000 for doc in nearby]
+
+        unseen = SeenSet.unseen_mask(await SeenSet.get(user_id), ids)
+        candidates = [(_id, store.row(_id), distance) for _id, distance, keep in zip(ids, distances, unseen)
+                      if keep and _id != user_id and store.row(_id) is not None]
+        if mask is not None:
+            candidates = [candidate for candidate in candidates
+                          if candidate[1] < len(mask) and mask[candidate[1]]]
+        if not candidates:
+            return []
+        scores = await asyncio.to_thread(
+            store.score, decode_vector(user['embedding']), [row for _, row, _ in candidates],
+            normalized=bool(user.get('embeddingNormalized')))
+        scores = scores - distance_penalty([distance for _, _, distance in candidates],
+                                           DISTANCE_WEIGHT, DISTANCE_SCALE_KM)
+
+        distances = {_id: distance * 1000 for _id, _, distance in candidates}
+        ranked = [candidates[i][0] for i in top_k(scores, len(scores)).indices]
+        fetch = limit * cls.ANN_OVERFETCH
+        matches, offset = [], 0
+
+        # Hydrate in rank order until enough candidates pass the Mongo-side filters
+        while len(matches) < limit and offset < len(ranked):
+            batch = ranked[offset:offset + fetch]
+            matches += [dict(doc, distance=distances[doc['_id']])
+                        for doc in await cls.hydrate(batch, query)]
+            offset += len(batch)
+            fetch *= 4
+
+        return matches[:limit]
+
+    @classmethod
+    async def recommend_many(cls, user_ids: List[str], k: int = 20, block_size: int = 256):
+        """
+        Yield (user_id, matches) for many users, scoring a block of query users
+        against the whole embedding store with one blocked matrix product.
+
+        Self and like-history exclusions are applied to each user's over-fetched
+        candidates with their in-memory seen set; gender-interest and status
+        with one profile query per block and round. Users left short re-query
+        with a wider k, like `recommend_indexed`.
+        """
+        store = get_store()
+        if len(store) == 0:
+            for user_id in user_ids:
+                yield user_id, await cls.recommend(user_id, k)
+            return
+
+        for start in range(0, len(user_ids), block_size):
+            block_ids = user_ids[start:start + block_size]
+            cursor = cls.user_collection.find(
+                {"_id": {"$in": [ObjectId(_id) for _id in block_ids]}},
+                {"embedding": 1, **FeatureStore.PROJECTION}
+            )
+            users = {str(user['_id']): user for user in await cursor.to_list()
+                     if user.get("embedding")}
+            queried = [_id for _id in block_ids if _id in users]
+            vectors = dict(zip(queried, decode_vectors([users[_id]['embedding'] for _id in queried])))
+            seen = await SeenSet.get_many(queried)
+            features = get_features()
+            visited = {_id: {_id} for _id in queried}
+            matches = {_id: [] for _id in queried}
+            pending = list(queried)
+            fetch = k * cls.ANN_OVERFETCH + 1
+
+            # Widen the search for the users still short, as recommend_indexed does,
+            # until each list is full or the store is exhausted
+            while pending:
+                results = await get_executor().query_many(np.stack([vectors[_id] for _id in pending]), fetch)
+                hits, exhausted = {}, set()
+                for _id, result in zip(pending, results):
+                    passing = set(result.ids)
+                    if features.ready:
+                        # Hard filters on the hit rows only, before any profile is fetched
+                        passing = set(np.asarray(result.ids)[features.mask(users[_id], result.indices)])
+                    new = [hit for hit in result.ids if hit not in visited[_id]]
+                    visited[_id].update(new)
+                    hits[_id] = SeenSet.unseen(seen[_id], [hit for hit in new if hit in passing])
+                    if not new:
+                        exhausted.add(_id)
+
+                candidates = list({hit for ids in hits.values() for hit in ids})
+                profiles = cls.user_collection.find(
+                    {"_id": {"$in": [ObjectId(_id) for _id in candidates]}, "status": "active"},
+                    {**cls.MATCH_PROJECTION, "genderInterest": 1}
+                )
+                profiles = {str(doc['_id']): dict(doc, _id=str(doc['_id']))
+                            for doc in await profiles.to_list()}
+
+                for user_id, ids in hits.items():
+                    gender = users[user_id].get("gender")
+                    matches[user_id] += [
+                        profiles[hit] for hit in ids
+                        if hit in profiles
+                        and (features.ready or not gender or profiles[hit].get("genderInterest") == gender)
+                    ]
+
+                if fetch >= len(store):
+                    break
+                pending = [_id for _id in pending if _id not in exhausted and len(matches[_id]) < k]
+                fetch *= 4
+
+            for user_id in block_ids:
+                yield user_id, [
+                    {key: value for key, value in match.items() if key != "genderInterest"}
+                    for match in matches.get(user_id, [])[:k]
+                ]
+
+    @classmethod
+    async def iter_embeddings(cls, batch_size: int = 1000):
+        """Yield (ids, float32 matrix) batches for every user with an embedding."""
+        cursor = cls.user_collection.find(
+            {"embedding": {"$exists": True}}, {"_id": 1, "embedding": 1}).batch_size(batch_size)
+
+        ids, vectors = [], []
+        async for user in cursor:
+            ids.append(str(user['_id']))
+            vectors.append(user['embedding'])
+            if len(ids) == batch_size:
+                yield ids, decode_vectors(vectors)
+                ids, vectors = [], []
+        if ids:
+            yield ids, decode_vectors(vectors)
+
+    @classmethod
+    async def build_index(cls, rebuild: bool = False, batch_size: int = 1000) -> int:
+        current = get_index()
+        # Build empty indexes off to the side so queries never see a half-built one
+        fresh = rebuild or len(current) == 0
+        index = current.empty_like() if fresh else current
+
+        total = 0
+        async for ids, vectors in cls.iter_embeddings(batch_size):
+            # hnswlib releases the GIL while inserting
+            await asyncio.to_thread(index.upsert, ids, vectors)
+            total += len(ids)
+            logger.info(f"Indexed {len(ids)} embeddings (total so far: {total})")
+
+        if fresh:
+            set_index(index)
+        index.save()
+        return total
+
+    @classmethod
+    async def build_segments(cls, batch_size: int = 1000) -> int:
+        """Build a segmented index from Mongo and swap it in once complete."""
+        if SEARCH_BACKEND == "ivf" and not get_ivf().trained:
+            await cls.build_ivf()
+        segments = new_segments()
+        cursor = cls.user_collection.find(
+            {"embedding": {"$exists": True}},
+            {"embedding": 1, "gender": 1, "genderInterest": 1, "status": 1}
+        ).batch_size(batch_size)
+
+        total = 0
+        while batch := await cursor.to_list(batch_size):
+            segments.upsert([str(user['_id']) for user in batch],
+                            decode_vectors([user['embedding'] for user in batch]),
+                            [SegmentedIndex.key(user) for user in batch])
+            total += len(batch)
+            logger.info(f"Segmented {len(batch)} users (total so far: {total})")
+
+        set_segments(segments)
+        logger.info(f"Segmented index built with {len(segments.sizes())} segments")
+        return total
+
+    @classmethod
+    async def build_store(cls, batch_size: int = 1000, store: EmbeddingStore | None = None) -> int:
+        """Copy every user embedding into `store` (the process' own by default) and flush it."""
+        store = get_store() if store is None else store
+        total = 0
+        async for ids, vectors in cls.iter_embeddings(batch_size):
+            store.upsert(ids, vectors)
+            total += len(ids)
+            logger.info(f"Stored {len(ids)} embeddings (total so far: {total})")
+
+        store.flush()
+        return total
+
+    @classmethod
+    async def build_ivf(cls, sample_size: int = IVF_TRAIN_SAMPLE, batch_size: int = 1000) -> int:
+        """Train the IVF quantizer on a random sample of embeddings, then add every user."""
+        cursor = cls.user_collection.aggregate([
+            {"$match": {"embedding": {"$exists": True}}},
+            {"$sample": {"size": sample_size}},
+            {"$project": {"embedding": 1}},
+        ])
+        sample = decode_vectors([user['embedding'] for user in await cursor.to_list()])
+        if len(sample) == 0:
+            logger.warning("No embeddings to train the IVF index on")
+            return 0
+
+        ivf = get_ivf().empty_like()
+        await asyncio.to_thread(ivf.train, sample)
+
+        total = 0
+        async for ids, vectors in cls.iter_embeddings(batch_size):
+            ivf.upsert(ids, vectors)
+            total += len(ids)
+            logger.info(f"Added {len(ids)} embeddings to IVF lists (total so far: {total})")
+
+        set_ivf(ivf)
+        ivf.save()
+        return total
+
+    @classmethod
+    async def build_geo(cls, batch_size: int = 1000) -> int:
+        """Fill the in-memory geo grid from `users.location`."""
+        geo = get_geo()
+        cursor = cls.user_collection.find(
+            {"location.coordinates": {"$exists": True}}, {"location": 1}).batch_size(batch_size)
+        total = 0
+        async for user in cursor:
+            point = coordinates(user.get("location"))
+            if point is not None:
+                geo.upsert(str(user['_id']), *point)
+                total += 1
+        logger.info(f"Geo index built with {total} users")
+        return total
+
+    @classmethod
+    async def build_features(cls, batch_size: int = 1000) -> int:
+        """Fill the feature columns for every user that has an embedding-store row."""
+        features = get_features()
+        cursor = cls.user_collection.find(
+            {"embedding": {"$exists": True}}, FeatureStore.PROJECTION).batch_size(batch_size)
+        total = 0
         async for user in cursor:
-            print(user)
-        # return [dict(user, _id=str(user['_id'])) for user in await cursor.to_list()]
+            total += features.upsert(str(user['_id']), user)
+        features.ready = True
+        logger.info(f"Feature store built with {total} users")
+        return total
+
+    @classmethod
+    def on_profile(cls, user_id: str, user: dict) -> None:
+        """Keep the profile cache, feature columns, segments and geo grid current after a profile change."""
+        ProfileCache.update(user_id, {field: user[field] for field in FeatureStore.FIELDS if field in user})
+        get_features().upsert(user_id, user)
+        if "location" in user:
+            cls.on_location(user_id, user["location"])
+        if user.get("status") and user["status"] != "active":
+            SuggestionCache.invalidate_candidate(user_id, reason="deactivated")
+
+        segments = get_segments()
+        previous = segments.segment_of(user_id)
+        if SEGMENTED_INDEX and previous is not None:
+            key = segments.key_after(user_id, user)
+            vector = get_store().vector(user_id)
+            if key != previous and vector is not None:
+                # Gender, interest or status changed: move the user to their new segment
+                segments.upsert([user_id], [vector], [key])
+
+    @classmethod
+    def on_like(cls, user_id: str, liked_user_id: str, liked: bool = True) -> None:
+        """Record a like (or its removal) in the seen set; the liker's cached list is stale."""
+        if liked:
+            SeenSet.add(user_id, [liked_user_id])
+        else:
+            SeenSet.remove(user_id, [liked_user_id])
+        SuggestionCache.invalidate(user_id, reason="like")
+
+    @classmethod
+    def on_location(cls, user_id: str, location) -> None:
+        """Keep the geo grid current after a location update."""
+        point = coordinates(location)
+        if point is None:
+            get_geo().remove(user_id)
+        else:
+            get_geo().upsert(user_id, *point)
+
+    @classmethod
+    def on_embedding(cls, user_id: str, embedding, user: dict | None = None) -> None:
+        """Keep the in-process search structures current after an embed event."""
+        SuggestionCache.invalidate(user_id, reason="embedding")
+        ProfileCache.update(user_id, cls.ai.embedding_update(embedding)["$set"])
+        store = get_store()
+        store.upsert([user_id], [embedding])
+
+        index = get_search_index()
+        if index is store:
+            return
+        if isinstance(index, SegmentedIndex):
+            # Before `build_segments` has run the user is picked up by it instead
+            key = index.key_after(user_id, user) if user else index.segment_of(user_id)
+            if len(index) > 0 and key is not None:
+                index.upsert([user_id], [embedding], [key])
+            return
+        if getattr(index, "trained", True):
+            index.upsert([user_id], [embedding])
+
+    @classmethod
+    async def compute_suggestions(cls, size: int = SUGGESTIONS_SIZE, batch_size: int = 1000) -> int:
+        """
+        Precompute every active user's top `size` matches into `suggestions`.
+
+        Users are scored `batch_size` at a time through `recommend_many`, so the
+        gender-interest and like-history exclusions match the live path.
+        """
+        if len(get_store()) == 0:
+            await cls.build_store()
+
+        cursor = cls.user_collection.find(
+            {"status": "active", "embedding": {"$exists": True}}, {"_id": 1}).batch_size(batch_size)
+
+        async def flush(user_ids):
+            generated_at = datetime.now(timezone.utc)
+            operations = [
+                ReplaceOne(
+                    {"_id": ObjectId(user_id)},
+                    {"matches": matches, "generatedAt": generated_at},
+                    upsert=True,
+                )
+                async for user_id, matches in cls.recommend_many(user_ids, size)
+            ]
+            await cls.suggestion_collection.bulk_write(operations, ordered=False)
+            return len(operations)
+
+        total = 0
+        user_ids = []
+        async for user in cursor:
+            user_ids.append(str(user['_id']))
+            if len(user_ids) == batch_size:
+                total += await flush(user_ids)
+                logger.info(f"Computed suggestions for {total} users so far")
+                user_ids = []
+        if user_ids:
+            total += await flush(user_ids)
+
+        logger.info(f"Suggestion precompute complete: {total} users updated.")
+        return total
+
+    @classmethod
+    async def precomputed_suggestions(cls, user_id: str, limit: int):
+        """
+        The user's precomputed matches minus anyone liked, deactivated or no
+        longer passing the hard filters since the list was built; None when
+        there is no fresh list or fewer than `limit` of its matches remain.
+        """
+        fresh_after = datetime.now(timezone.utc) - timedelta(seconds=SUGGESTIONS_TTL)
+        suggestion = await cls.suggestion_collection.find_one(
+            {"_id": ObjectId(user_id), "generatedAt": {"$gte": fresh_after}}, {"matches": 1})
+        if suggestion is None or len(suggestion['matches']) < limit:
+            return None
+        user = await ProfileCache.get(user_id)
+        if not user:
+            return None
+
+        matches = suggestion['matches']
+        ids = [match['_id'] for match in matches]
+        keep = SeenSet.unseen_mask(await SeenSet.get(user_id), ids)
+        features = get_features()
+        if features.ready:
+            # Only the stored matches' rows, not the full-column mask of hard_filters
+            store = get_store()
+            rows = [store.row(_id) for _id in ids]
+            keep &= features.mask(user, [-1 if row is None else row for row in rows])
+        else:
+            _, query = await cls.hard_filters(user)
+            cursor = cls.user_collection.find(
+                {"_id": {"$in": [ObjectId(_id) for _id in ids]}, **query}, {"_id": 1})
+            passing = {str(doc['_id']) for doc in await cursor.to_list()}
+            keep &= np.array([_id in passing for _id in ids], dtype=bool)
+
+        matches = [match for match, ok in zip(matches, keep) if ok]
+        return matches[:limit] if len(matches) >= limit else None
+
+    @classmethod
+    async def suggestion_page(cls, user_id: str, limit: int = 20, cursor: str | None = None) -> dict:
+        """
+        One page of the user's suggestions and the cursor for the next page.
+
+        Without a cursor, `SUGGESTION_PAGE_DEPTH` matches are ranked once and
+        cached for `SUGGESTION_PAGE_TTL`; later pages are slices of that
+        ranking, minus anyone liked since. Raises ValueError for a malformed
+        cursor and CursorExpired once its ranking has been dropped.
+        """
+        if cursor is None:
+            ranking_id, offset = secrets.token_urlsafe(8), 0
+            ranking = await cls.recommend(user_id, SUGGESTION_PAGE_DEPTH)
+            cls._rankings[user_id] = (ranking_id, ranking)
+        else:
+            ranking_id, offset = decode_cursor(cursor)
+            cached = cls._rankings.get(user_id)
+            if cached is None or cached[0] != ranking_id:
+                raise CursorExpired(f"Suggestions cursor for {user_id} has expired")
+            ranking = cached[1]
+
+        page = ranking[offset:offset + limit]
+        unseen = SeenSet.unseen_mask(await SeenSet.get(user_id), [match['_id'] for match in page])
+        next_offset = offset + limit
+        return {
+            "data": [match for match, keep in zip(page, unseen) if keep],
+            "nextCursor": encode_cursor(ranking_id, next_offset) if next_offset < len(ranking) else None,
+        }
@@ -0,0 +1,134 @@
+import asyncio
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import List, Optional, Tuple
+import numpy as np
+from threadpoolctl import threadpool_limits
+from app.config.logger import logger
+from app.services.EmbeddingStore import EmbeddingStore
+from app.utils.topk import TopK
+
+# Store opened by each worker process; it maps the same files as the writer,
+# so the matrix pages are shared through the page cache rather than copied.
+_worker_store: Optional[EmbeddingStore] = None
+
+
+def _init_worker(path: str) -> None:
+    global _worker_store
+    # One BLAS thread per process, parallelism comes from the pool itself
+    threadpool_limits(1)
+    _worker_store = EmbeddingStore(path, readonly=True, lookups=False)
+
+
+def _score_shard(store: EmbeddingStore, queries: np.ndarray, start: int, stop: int, k: int,
+                 block_size: int, mask: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """Running top-k over rows [start, stop), `block_size` rows at a time; `mask` is aligned with `start`."""
+    best_rows = np.empty((len(queries), 0), dtype=np.int64)
+    best_scores = np.empty((len(queries), 0), dtype=np.float32)
+    for block in range(start, stop, block_size):
+        rows, scores = store.top_k_range(
+            queries, block, min(block + block_size, stop), k,
+            None if mask is None else mask[block - start:])
+        best_rows, best_scores = store.merge_top_k(
+            np.hstack([best_rows, rows]), np.hstack([best_scores, scores]), k)
+    return best_rows, best_scores
+
+
+def _score_shard_in_worker(queries: np.ndarray, start: int, stop: int, k: int, block_size: int,
+                           capacity: int, count: int, mask: Optional[np.ndarray] = None
+                           ) -> Tuple[np.ndarray, np.ndarray]:
+    _worker_store.remap(capacity, count)
+    return _score_shard(_worker_store, queries, start, stop, k, block_size, mask)
+
+
+class ScoringExecutor:
+    """
+    Scores queries against the embedding store off the event loop.
+
+    The store's rows are split into contiguous shards, each shard's top-k is
+    computed in a worker (a process, or a thread since numpy releases the GIL
+    in BLAS calls) and the per-shard results are merged in the caller.
+    """
+
+    def __init__(self, store: EmbeddingStore, workers: int, mode: str = "process",
+                 min_shard_rows: int = 50000, block_size: int = 65536):
+        self.store = store
+        self.workers = max(1, workers)
+        self.mode = mode
+        self.min_shard_rows = min_shard_rows
+        self.block_size = block_size
+        self._pool: Optional[Executor] = None
+
+    def _get_pool(self) -> Executor:
+        if self._pool is None:
+            if self.mode == "process":
+                # Workers open the store from disk, so it must have a meta file first;
+                # a read-only store belongs to another writer and is never flushed over
+                if not self.store.readonly:
+                    self.store.flush()
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                    initargs=(self.store.path,),
+                )
+            else:
+                self._pool = ThreadPoolExecutor(max_workers=self.workers)
+            logger.info(f"Started {self.workers} {self.mode} scoring workers")
+        return self._pool
+
+    def _shards(self) -> List[Tuple[int, int]]:
+        count = self.store.count
+        shards = max(1, min(self.workers, -(-count // self.min_shard_rows)))
+        bounds = np.linspace(0, count, shards + 1, dtype=np.int64)
+        return list(zip(bounds[:-1].tolist(), bounds[1:].tolist()))
+
+    async def query_many(self, vectors, k: int, normalized: bool = False,
+                         mask: Optional[np.ndarray] = None) -> List[TopK]:
+        """
+        Exact top-k over the whole store for each query, awaited off the event
+        loop. Rows where `mask` is False are skipped for every query.
+        """
+        store = self.store
+        queries = store.normalize_queries(vectors, normalized)
+        if len(store) == 0:
+            return store.to_top_k(np.empty((len(queries), 0), dtype=np.int64),
+                                  np.empty((len(queries), 0), dtype=np.float32), 0)
+
+        if mask is not None and len(mask) < store.count:
+            # Rows appended after the mask was built (an embed handled while the caller awaited)
+            # have not been filtered, so they are excluded
+            mask = np.concatenate([mask, np.zeros(store.count - len(mask), dtype=bool)])
+
+        loop = asyncio.get_running_loop()
+        pool = self._get_pool()
+        if self.mode == "process":
+            parts = [
+                loop.run_in_executor(pool, _score_shard_in_worker, queries, start, stop, k,
+                                     self.block_size, store.capacity, store.count,
+                                     None if mask is None else mask[start:stop])
+                for start, stop in self._shards()
+            ]
+        else:
+            parts = [
+                loop.run_in_executor(pool, _score_shard, store, queries, start, stop, k,
+                                     self.block_size, None if mask is None else mask[start:stop])
+                for start, stop in self._shards()
+            ]
+        parts = await asyncio.gather(*parts)
+
+        rows, scores = store.merge_top_k(
+            np.hstack([rows for rows, _ in parts]), np.hstack([scores for _, scores in parts]), k)
+        return store.to_top_k(rows, scores, k)
+
+    async def query(self, vector, k: int, normalized: bool = False,
+                    mask: Optional[np.ndarray] = None) -> List[Tuple[str, float]]:
+        """Same contract as `EmbeddingStore.query`, but awaitable; masked-out rows never come back."""
+        best = (await self.query_many([vector], k, normalized, mask))[0]
+        return [(_id, float(score)) for _id, score in zip(best.ids, best.scores)
+                if score != -np.inf]
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
@@ -0,0 +1,136 @@
+from itertools import compress
+from typing import Dict, Iterable, List
+import numpy as np
+from bson import ObjectId
+from cachetools import LRUCache
+from app.config.db import db
+from app.config.env import SEEN_CACHE_USERS
+from app.config.logger import logger
+
+
+class SeenSet:
+    """
+    Per-user sets of already-liked user ids, held in process.
+
+    Each set is a sorted array of 12-byte ObjectIds, loaded lazily from
+    `likehistories` and kept current by like events, so excluding seen
+    candidates is a vectorized `searchsorted` instead of a `$lookup`.
+    """
+
+    DTYPE = "S12"
+
+    like_collection = db["likehistories"]
+    _sets: LRUCache = LRUCache(maxsize=SEEN_CACHE_USERS)
+    # Likes that arrive while a user's set is being loaded, applied once it lands
+    _pending: Dict[str, List[tuple]] = {}
+
+    @classmethod
+    def encode(cls, ids: Iterable) -> np.ndarray:
+        return np.asarray([ObjectId(_id).binary for _id in ids], dtype=cls.DTYPE)
+
+    @classmethod
+    def _empty(cls) -> np.ndarray:
+        return np.empty(0, dtype=cls.DTYPE)
+
+    # ------------------------------------------------------------------
+    # Loading
+    # ------------------------------------------------------------------
+    @classmethod
+    async def get_many(cls, user_ids: List[str]) -> Dict[str, np.ndarray]:
+        """Seen sets for `user_ids`, loading every missing one in a single query."""
+        missing = [_id for _id in dict.fromkeys(user_ids) if _id not in cls._sets]
+        if missing:
+            for _id in missing:
+                cls._pending.setdefault(_id, [])
+            try:
+                cursor = cls.like_collection.find(
+                    {"userId": {"$in": [ObjectId(_id) for _id in missing]}},
+                    {"userId": 1, "likedUserId": 1}
+                )
+                liked: Dict[str, List[bytes]] = {_id: [] for _id in missing}
+                async for like in cursor:
+                    liked[str(like['userId'])].append(like['likedUserId'].binary)
+
+                for _id in missing:
+                    cls._sets[_id] = np.unique(np.asarray(liked[_id], dtype=cls.DTYPE))
+                    for added, ids in cls._pending.pop(_id, []):
+                        cls._apply(_id, ids, added)
+            finally:
+                for _id in missing:
+                    cls._pending.pop(_id, None)
+            logger.debug(f"Loaded seen sets for {len(missing)} users")
+
+        return {_id: cls._sets.get(_id, cls._empty()) for _id in user_ids}
+
+    @classmethod
+    async def get(cls, user_id: str) -> np.ndarray:
+        return (await cls.get_many([user_id]))[user_id]
+
+    # ------------------------------------------------------------------
+    # Updates from like events
+    # ------------------------------------------------------------------
+    @classmethod
+    def _apply(cls, user_id: str, ids: np.ndarray, added: bool) -> None:
+        seen = cls._sets.get(user_id)
+        if seen is None:
+            return
+        cls._sets[user_id] = np.union1d(seen, ids) if added else np.setdiff1d(seen, ids)
+
+    @classmethod
+    def _update(cls, user_id: str, liked_ids: Iterable, added: bool) -> None:
+        user_id = str(user_id)
+        ids = cls.encode(liked_ids)
+        if user_id in cls._pending:
+            cls._pending[user_id].append((added, ids))
+        # Users not in memory pick the change up from Mongo on their next load
+        cls._apply(user_id, ids, added)
+
+    @classmethod
+    def add(cls, user_id: str, liked_ids: Iterable) -> None:
+        cls._update(user_id, liked_ids, added=True)
+
+    @classmethod
+    def remove(cls, user_id: str, liked_ids: Iterable) -> None:
+        cls._update(user_id, liked_ids, added=False)
+
+    @classmethod
+    def invalidate(cls, user_id: str) -> None:
+        cls._sets.pop(str(user_id), None)
+
+    # ------------------------------------------------------------------
+    # Exclusion
+    # ------------------------------------------------------------------
+    @classmethod
+    def unseen_mask(cls, seen: np.ndarray, candidate_ids: Iterable) -> np.ndarray:
+        """Boolean mask, True where the candidate is not in `seen`."""
+        candidates = cls.encode(candidate_ids)
+        if len(seen) == 0 or len(candidates) == 0:
+            return np.ones(len(candidates), dtype=bool)
+        positions = np.minimum(np.searchsorted(seen, candidates), len(seen) - 1)
+        return seen[positions] != candidates
+
+    @classmethod
+    def unseen(cls, seen: np.ndarray, candidate_ids: List[str]) -> List[str]:
+        mask = cls.unseen_mask(seen, candidate_ids)
+        return [_id for _id, keep in zip(candidate_ids, mask) if keep]
+
+    @classmethod
+    async def exclude(cls, seen: np.ndarray, cursor, limit: int, chunk_size: int = 1024):
+        """Re-yield the documents of `cursor` that are not in `seen`, at most `limit` of them."""
+        async def chunks():
+            chunk = []
+            async for doc in cursor:
+                chunk.append(doc)
+                if len(chunk) == chunk_size:
+                    yield chunk
+                    chunk = []
+            if chunk:
+                yield chunk
+
+        remaining = limit
+        async for chunk in chunks():
+            for doc in compress(chunk, cls.unseen_mask(seen, [doc['_id'] for doc in chunk])):
+                if remaining == 0:
+                    return
+                remaining -= 1
+                yield doc
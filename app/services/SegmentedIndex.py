@@ -0,0 +1,163 @@
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import numpy as np
+from app.services.EmbeddingStore import EmbeddingStore
+from app.utils.metrics import Counter, Gauge
+from app.utils.topk import top_k
+
+SegmentKey = Tuple[str, str, str]   # (gender, genderInterest, status)
+
+SEGMENT_SIZE = Gauge("recommendation_segment_size", "Users indexed per (gender, genderInterest, status) segment")
+SEGMENT_SCANS = Counter("recommendation_segment_scans_total", "Queries routed to each segment")
+SEGMENT_SKIPPED = Counter("recommendation_segment_skipped_total",
+                          "Segments a query did not have to visit because no user in them can match")
+
+
+def segment_label(key: SegmentKey) -> str:
+    return "|".join(part or "-" for part in key)
+
+
+class StoreSegment:
+    """Exact search over a subset of embedding-store rows."""
+
+    def __init__(self, store: EmbeddingStore):
+        self.store = store
+        self._lock = threading.Lock()
+        self._rows = np.empty(0, dtype=np.int64)
+        self._ids: List[str] = []
+        self._where: Dict[str, int] = {}   # _id -> position in _rows
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def upsert(self, ids: List[str], vectors=None) -> None:
+        """Add `ids`; their vectors are read from the store, so `vectors` is ignored."""
+        with self._lock:
+            for _id in ids:
+                row = self.store.row(_id)
+                if row is None:
+                    continue
+                position = self._where.get(_id)
+                if position is None:
+                    position = len(self._ids)
+                    if position == len(self._rows):
+                        self._rows = np.resize(self._rows, max(16, 2 * position))
+                    self._ids.append(_id)
+                    self._where[_id] = position
+                self._rows[position] = row
+
+    def remove(self, _id: str) -> None:
+        with self._lock:
+            position = self._where.pop(_id, None)
+            if position is None:
+                return
+            last = len(self._ids) - 1
+            if position != last:
+                # Swap the last entry into the hole so the rows stay dense
+                self._ids[position] = self._ids[last]
+                self._rows[position] = self._rows[last]
+                self._where[self._ids[position]] = position
+            self._ids.pop()
+
+    def query(self, vector, k: int) -> List[Tuple[str, float]]:
+        with self._lock:
+            ids, rows = list(self._ids), self._rows[:len(self._ids)].copy()
+        if not ids:
+            return []
+        best = top_k(self.store.score(vector, rows), k)
+        return [(ids[i], float(score)) for i, score in zip(best.indices, best.scores)]
+
+
+class SegmentedIndex:
+    """
+    One sub-index per (gender, genderInterest, status) segment.
+
+    A query visits only the segments whose users could match the querying
+    user, so users who can never be shown to them are neither scanned nor
+    traversed. `factory` builds an empty sub-index of the configured backend.
+    """
+
+    def __init__(self, factory: Callable[[], Any]):
+        self.factory = factory
+        self._lock = threading.Lock()
+        self._segments: Dict[SegmentKey, Any] = {}
+        self._segment_of: Dict[str, SegmentKey] = {}
+
+    FIELDS = ("gender", "genderInterest", "status")
+
+    @classmethod
+    def key(cls, user: dict) -> SegmentKey:
+        return tuple(user.get(field) or "" for field in cls.FIELDS)
+
+    def key_after(self, _id: str, user: dict) -> SegmentKey:
+        """Segment key of `_id` after an update carrying `user`; fields it leaves out keep their value."""
+        previous = self.segment_of(_id)
+        current = {} if previous is None else dict(zip(self.FIELDS, previous))
+        return self.key({**current, **user})
+
+    def __len__(self) -> int:
+        return len(self._segment_of)
+
+    def __contains__(self, _id: str) -> bool:
+        return str(_id) in self._segment_of
+
+    def segment_of(self, _id: str) -> Optional[SegmentKey]:
+        return self._segment_of.get(str(_id))
+
+    def sizes(self) -> Dict[SegmentKey, int]:
+        return {key: len(segment) for key, segment in self._segments.items()}
+
+    # ------------------------------------------------------------------
+    # Writes
+    # ------------------------------------------------------------------
+    def upsert(self, ids: List[str], vectors, keys: List[SegmentKey]) -> None:
+        """Insert or update users, moving any whose segment key has changed."""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        groups: Dict[SegmentKey, List[int]] = {}
+        with self._lock:
+            for i, (_id, key) in enumerate(zip(ids, keys)):
+                _id = str(_id)
+                previous = self._segment_of.get(_id)
+                if previous is not None and previous != key:
+                    self._segments[previous].remove(_id)
+                self._segment_of[_id] = key
+                groups.setdefault(key, []).append(i)
+
+            for key, positions in groups.items():
+                segment = self._segments.get(key)
+                if segment is None:
+                    segment = self._segments[key] = self.factory()
+                segment.upsert([str(ids[i]) for i in positions], vectors[positions])
+            for key, segment in self._segments.items():
+                SEGMENT_SIZE.set(len(segment), segment=segment_label(key))
+
+    def remove(self, _id: str) -> None:
+        with self._lock:
+            key = self._segment_of.pop(str(_id), None)
+            if key is not None:
+                self._segments[key].remove(str(_id))
+                SEGMENT_SIZE.set(len(self._segments[key]), segment=segment_label(key))
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+    def compatible(self, user: dict) -> List[SegmentKey]:
+        """Active segments whose users want `user`'s gender and have the gender `user` wants."""
+        gender, interest = user.get("gender"), user.get("genderInterest")
+        return [key for key in self._segments
+                if key[2] == "active"
+                and (not gender or key[1] == gender)
+                and (not interest or key[0] == interest)]
+
+    def query(self, vector, k: int, keys: Optional[List[SegmentKey]] = None) -> List[Tuple[str, float]]:
+        """Top `k` (_id, cosine similarity) pairs across the `keys` segments (all without)."""
+        keys = list(self._segments) if keys is None else keys
+        SEGMENT_SKIPPED.inc(len(self._segments) - len(keys))
+        hits = []
+        for key in keys:
+            segment = self._segments.get(key)
+            if segment is None:
+                continue
+            SEGMENT_SCANS.inc(segment=segment_label(key))
+            hits += segment.query(vector, k)
+        return sorted(hits, key=lambda hit: -hit[1])[:k]
@@ -0,0 +1,128 @@
+from typing import Dict, List, Optional, Set, Tuple
+from cachetools import Cache, TTLCache
+from app.config.env import SUGGESTION_CACHE_MAX_PROFILES, SUGGESTION_CACHE_TTL
+from app.utils import metrics
+
+REQUESTS = metrics.Counter("suggestion_cache_requests_total", "Suggestion cache lookups by result")
+EVICTIONS = metrics.Counter("suggestion_cache_evictions_total", "Suggestion lists dropped by the size bound or TTL")
+INVALIDATIONS = metrics.Counter("suggestion_cache_invalidations_total", "Suggestion lists dropped by events")
+STALE = metrics.Counter("suggestion_cache_stale_puts_total", "Lists not cached because an invalidation landed mid-compute")
+
+Entry = Tuple[int, List[dict]]   # (limit it was computed for, ranked matches)
+
+
+class _Lists(TTLCache):
+    """TTLCache that keeps the candidate -> cached users map in step and counts evictions."""
+
+    def __init__(self, maxsize: int, ttl: float, dependents: Dict[str, Set[str]]):
+        super().__init__(maxsize, ttl, getsizeof=lambda entry: len(entry[1]) + 1)
+        self.dependents = dependents
+
+    def _forget(self, user_id: str, entry: Entry) -> None:
+        for match in entry[1]:
+            users = self.dependents.get(match['_id'])
+            if users is not None:
+                users.discard(user_id)
+                if not users:
+                    del self.dependents[match['_id']]
+
+    def __delitem__(self, user_id):
+        # Read past the TTL check: an expired entry still has dependents to forget
+        entry = Cache.__getitem__(self, user_id)
+        try:
+            super().__delitem__(user_id)
+        finally:
+            self._forget(user_id, entry)
+
+    def expire(self, time=None):
+        expired = super().expire(time)
+        for user_id, entry in expired:
+            self._forget(user_id, entry)
+        if expired:
+            EVICTIONS.inc(len(expired), reason="ttl")
+        return expired
+
+    def popitem(self):
+        item = super().popitem()
+        EVICTIONS.inc(reason="size")
+        return item
+
+
+class SuggestionCache:
+    """
+    Ranked suggestion lists per user, LRU-ordered with a TTL.
+
+    The bound is on the total number of cached profiles, not users. A list
+    is dropped when its user re-embeds or likes someone, and every list
+    containing a user is dropped when that user deactivates.
+
+    Every invalidation also ticks a clock and stamps the user or candidate
+    with it, so a list whose ranking started before a later stamp is never
+    cached: it could hold the user just liked or deactivated.
+    """
+
+    _dependents: Dict[str, Set[str]] = {}   # candidate _id -> users whose cached list holds it
+    _lists: _Lists = _Lists(SUGGESTION_CACHE_MAX_PROFILES, SUGGESTION_CACHE_TTL, _dependents)
+
+    _clock = 0
+    # Stamps only need to outlive the computations running across them
+    _invalidated: TTLCache = TTLCache(SUGGESTION_CACHE_MAX_PROFILES, SUGGESTION_CACHE_TTL)   # user _id -> clock
+    _dropped: TTLCache = TTLCache(SUGGESTION_CACHE_MAX_PROFILES, SUGGESTION_CACHE_TTL)       # candidate _id -> clock
+
+    @classmethod
+    def get(cls, user_id: str, limit: int) -> Optional[List[dict]]:
+        entry = cls._lists.get(user_id)
+        # A list computed for a smaller limit can't answer a larger one, unless it came back short
+        if entry is None or (limit > entry[0] and len(entry[1]) == entry[0]):
+            REQUESTS.inc(result="miss")
+            return None
+        REQUESTS.inc(result="hit")
+        return entry[1][:limit]
+
+    @classmethod
+    def generation(cls) -> int:
+        """Invalidation clock; read it before ranking and pass it to `put`."""
+        return cls._clock
+
+    @classmethod
+    def invalidated_at(cls, user_id: str) -> int:
+        """Clock at the user's last remembered invalidation, 0 if none."""
+        return cls._invalidated.get(user_id, 0)
+
+    @classmethod
+    def put(cls, user_id: str, limit: int, matches: List[dict], generation: int) -> None:
+        """Cache `matches`, unless the user or one of them was invalidated after `generation`."""
+        if cls.invalidated_at(user_id) > generation or any(
+                cls._dropped.get(match['_id'], 0) > generation for match in matches):
+            STALE.inc()
+            return
+        cls._lists.pop(user_id, None)
+        try:
+            cls._lists[user_id] = (limit, list(matches))
+        except ValueError:
+            return  # a single list larger than the whole bound is not cached
+        for match in matches:
+            cls._dependents.setdefault(match['_id'], set()).add(user_id)
+
+    @classmethod
+    def invalidate(cls, user_id: str, reason: str) -> None:
+        cls._clock += 1
+        cls._invalidated[user_id] = cls._clock
+        if cls._lists.pop(user_id, None) is not None:
+            INVALIDATIONS.inc(reason=reason)
+
+    @classmethod
+    def invalidate_candidate(cls, candidate_id: str, reason: str) -> None:
+        """Drop every cached list that contains `candidate_id`."""
+        cls._clock += 1
+        cls._dropped[candidate_id] = cls._clock
+        for user_id in list(cls._dependents.get(candidate_id, ())):
+            cls.invalidate(user_id, reason)
+
+    @classmethod
+    def profiles(cls) -> int:
+        return int(cls._lists.currsize)
+
+
+metrics.Gauge("suggestion_cache_profiles", "Profiles held in cached suggestion lists",
+              collect=lambda: {metrics.labels(): SuggestionCache.profiles()})
@@ -1,6 +1,8 @@
-from typing import Any, Callable, Dict
+from typing import Any, Callable, Dict, List
+from pydantic import BaseModel
 
 EventHandler = Callable[[Any, Any], None]
+BatchEventHandler = Callable[[List[Any], Any], None]
 
 class QueueConfig:
     def __init__(
@@ -9,10 +11,23 @@ class QueueConfig:
         durable: bool,
         routing_key_pattern: str,
         exchange: str,
-        handlers: Dict[str, EventHandler]
+        handlers: Dict[str, EventHandler],
+        batch_size: int = 1,
+        batch_window_ms: int = 0,
+        batch_handlers: Dict[str, BatchEventHandler] | None = None
     ):
         self.name = name
         self.durable = durable
         self.routing_key_pattern = routing_key_pattern
         self.exchange = exchange
         self.handlers = handlers
+        # Deliveries are buffered up to `batch_size` messages or `batch_window_ms`,
+        # then consecutive events with a batch handler are handled in one call
+        self.batch_size = batch_size
+        self.batch_window_ms = batch_window_ms
+        self.batch_handlers = batch_handlers or {}
+
+
+class BatchSuggestionsRequest(BaseModel):
+    userIds: List[str]
+    limit: int = 20
@@ -1,5 +1,5 @@
 from typing import Optional
-from app.types import EventHandler, QueueConfig
+from app.types import BatchEventHandler, EventHandler, QueueConfig
 
 class RabbitMQRouter:
     def __init__(self, config: QueueConfig) -> None:
@@ -18,11 +18,25 @@ class RabbitMQRouter:
             name: handler
         }
 
+    def route_batch(self, name: str, handler: BatchEventHandler) -> None:
+        """Handle runs of `name` events in one call when the queue is batched; `route` it too."""
+        if name not in self.config.handlers:
+            raise ValueError(f"Route {name} before adding its batch handler")
+        if not handler or not callable(handler):
+            raise ValueError("Handler must be a valid function")
+        self.config.batch_handlers = {
+            **self.config.batch_handlers,
+            name: handler
+        }
+
     def remove_route(self, name: str) -> None:
         if name in self.config.handlers:
             self.config.handlers = {
                 k: v for k, v in self.config.handlers.items() if k != name
             }
+        self.config.batch_handlers = {
+            k: v for k, v in self.config.batch_handlers.items() if k != name
+        }
 
     def get_handler(self, name: str) -> Optional[EventHandler]:
         return self.config.handlers.get(name)
@@ -0,0 +1,31 @@
+from typing import Any, List
+import numpy as np
+from bson.binary import Binary, BinaryVectorDtype, VECTOR_SUBTYPE
+
+# BSON binary vector layout (subtype 9): 1 dtype byte, 1 padding byte, then the
+# packed little-endian values. Atlas Vector Search reads the same format.
+HEADER = BinaryVectorDtype.FLOAT32.value + b"\x00"
+
+
+def encode_vector(vector) -> Binary:
+    """Pack a vector as a float32 BSON binary vector."""
+    return Binary(HEADER + np.asarray(vector, dtype="<f4").tobytes(), VECTOR_SUBTYPE)
+
+
+def is_binary(value: Any) -> bool:
+    return isinstance(value, bytes)
+
+
+def decode_vector(value) -> np.ndarray:
+    """Decode `users.embedding` in either the binary or the legacy array format."""
+    if is_binary(value):
+        return np.frombuffer(value, dtype="<f4", offset=len(HEADER))
+    return np.asarray(value, dtype=np.float32)
+
+
+def decode_vectors(values: List[Any]) -> np.ndarray:
+    """Stack many `users.embedding` values into one float32 matrix."""
+    if values and all(is_binary(value) for value in values):
+        packed = b"".join(memoryview(value)[len(HEADER):] for value in values)
+        return np.frombuffer(packed, dtype="<f4").reshape(len(values), -1)
+    return np.asarray([decode_vector(value) for value in values], dtype=np.float32)
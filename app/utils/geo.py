@@ -0,0 +1,27 @@
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088  # mean Earth radius
+KM_PER_DEGREE = np.pi * EARTH_RADIUS_KM / 180
+
+
+def haversine_km(lat: float, lng: float, lats, lngs) -> np.ndarray:
+    """Great-circle distance in km from one point to arrays of points, in one pass."""
+    lat, lng = np.radians(lat), np.radians(lng)
+    lats, lngs = np.radians(np.asarray(lats, dtype=np.float64)), np.radians(np.asarray(lngs, dtype=np.float64))
+    a = np.sin((lats - lat) / 2) ** 2 + np.cos(lat) * np.cos(lats) * np.sin((lngs - lng) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+def distance_penalty(distances_km, weight: float, scale_km: float) -> np.ndarray:
+    """Score penalty rising from 0 at 0 km towards `weight` far beyond `scale_km`; NaN distances get none."""
+    distances_km = np.asarray(distances_km, dtype=np.float64)
+    return np.where(np.isnan(distances_km), 0.0, weight * -np.expm1(-distances_km / scale_km))
+
+
+def coordinates(location) -> tuple | None:
+    """(lat, lng) of a GeoJSON point as stored in `users.location`, or None."""
+    try:
+        lng, lat = location["coordinates"][:2]
+        return float(lat), float(lng)
+    except (KeyError, TypeError, ValueError):
+        return None
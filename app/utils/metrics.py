@@ -0,0 +1,108 @@
+import threading
+from typing import Callable, Dict, List, Tuple
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+_registry: List["Metric"] = []
+_registry_lock = threading.Lock()
+
+
+def _key(labels: Dict[str, str]) -> LabelKey:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _format(name: str, key: LabelKey, value: float) -> str:
+    labels = ",".join(f'{label}="{value}"' for label, value in key)
+    return f"{name}{{{labels}}} {value}" if labels else f"{name} {value}"
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, description: str):
+        self.name = name
+        self.description = description
+        self._lock = threading.Lock()
+        self._values: Dict[LabelKey, float] = {}
+        with _registry_lock:
+            _registry.append(self)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            return [_format(self.name, key, value) for key, value in sorted(self._values.items())]
+
+    def render(self) -> str:
+        return "\n".join([f"# HELP {self.name} {self.description}",
+                          f"# TYPE {self.name} {self.kind}", *self.samples()])
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = _key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    """A value that is set directly, or read from `collect` on every scrape."""
+    kind = "gauge"
+
+    def __init__(self, name: str, description: str,
+                 collect: Callable[[], Dict[LabelKey, float]] | None = None):
+        super().__init__(name, description)
+        self._collect = collect
+
+    def set(self, value: float, **labels) -> None:
+        with self._lock:
+            self._values[_key(labels)] = value
+
+    def samples(self) -> List[str]:
+        if self._collect is not None:
+            values = self._collect()
+            with self._lock:
+                self._values = dict(values)
+        return super().samples()
+
+
+class Histogram(Metric):
+    """Observations counted into cumulative `le` buckets, with their sum and count."""
+    kind = "histogram"
+
+    def __init__(self, name: str, description: str, buckets: Tuple[float, ...]):
+        super().__init__(name, description)
+        self.buckets = tuple(sorted(buckets))
+        self._observations: Dict[LabelKey, List[float]] = {}   # bucket counts, then +Inf, sum
+
+    def observe(self, value: float, **labels) -> None:
+        key = _key(labels)
+        with self._lock:
+            counts = self._observations.setdefault(key, [0] * (len(self.buckets) + 2))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            counts[-2] += 1
+            counts[-1] += value
+
+    def samples(self) -> List[str]:
+        lines = []
+        with self._lock:
+            for key, counts in sorted(self._observations.items()):
+                for bound, count in zip((*self.buckets, "+Inf"), counts):
+                    lines.append(_format(f"{self.name}_bucket", tuple(sorted((*key, ("le", str(bound))))), count))
+                lines.append(_format(f"{self.name}_sum", key, counts[-1]))
+                lines.append(_format(f"{self.name}_count", key, counts[-2]))
+        return lines
+
+
+def labels(**values) -> LabelKey:
+    """Label key for the dicts returned by a Gauge `collect` callback."""
+    return _key(values)
+
+
+def render() -> str:
+    """Every registered metric in the Prometheus text exposition format."""
+    with _registry_lock:
+        metrics = list(_registry)
+    return "\n".join(metric.render() for metric in metrics) + "\n"
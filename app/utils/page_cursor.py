@@ -0,0 +1,26 @@
+import base64
+import json
+from typing import Tuple
+
+
+class CursorExpired(Exception):
+    """The ranking a cursor points into is no longer cached."""
+
+
+def encode_cursor(ranking_id: str, offset: int) -> str:
+    """Opaque, URL-safe token pointing at `offset` in a cached ranking."""
+    raw = json.dumps({"r": ranking_id, "o": offset}, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def decode_cursor(token: str) -> Tuple[str, int]:
+    """(ranking_id, offset) of a token from `encode_cursor`; ValueError if malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        data = json.loads(raw)
+        ranking_id, offset = str(data["r"]), int(data["o"])
+    except (ValueError, TypeError, KeyError) as e:
+        raise ValueError(f"Invalid cursor: {token}") from e
+    if offset < 0:
+        raise ValueError(f"Invalid cursor: {token}")
+    return ranking_id, offset
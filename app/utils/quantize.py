@@ -0,0 +1,44 @@
+from typing import List, Tuple
+import numpy as np
+
+# Per-vector asymmetric int8 scalar quantization:
+#   x ≈ (code + 128) * scale + offset, with offset = min(x) and scale = (max(x) - min(x)) / 255
+
+
+def quantize(vectors) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Return (int8 codes, float32 scale, float32 offset), one scale/offset per vector."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    vectors = vectors.reshape(-1, vectors.shape[-1])
+    offset = vectors.min(axis=1)
+    scale = (vectors.max(axis=1) - offset) / 255
+    scale[scale == 0] = 1
+
+    codes = np.round((vectors - offset[:, None]) / scale[:, None]) - 128
+    return np.clip(codes, -128, 127).astype(np.int8), scale.astype(np.float32), offset.astype(np.float32)
+
+
+def dequantize(codes: np.ndarray, scale: np.ndarray, offset: np.ndarray) -> np.ndarray:
+    return (codes.astype(np.float32) + 128) * scale[:, None] + offset[:, None]
+
+
+def scores(codes: np.ndarray, scale: np.ndarray, offset: np.ndarray, query) -> np.ndarray:
+    """Approximate dot products of `query` with the quantized vectors, without dequantizing."""
+    query = np.asarray(query, dtype=np.float32)
+    query_sum = query.sum()
+    return scale * (codes.astype(np.float32) @ query + 128 * query_sum) + offset * query_sum
+
+
+def to_field(vector) -> dict:
+    """The `embeddingQ` sub-document for one vector; codes are stored as BSON binary."""
+    codes, scale, offset = quantize(vector)
+    return {"codes": codes[0].tobytes(), "scale": float(scale[0]), "offset": float(offset[0])}
+
+
+def from_fields(fields: List[dict]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Stack `embeddingQ` sub-documents into (codes matrix, scale, offset) arrays."""
+    codes = np.frombuffer(b"".join(field["codes"] for field in fields), dtype=np.int8)
+    return (
+        codes.reshape(len(fields), -1),
+        np.asarray([field["scale"] for field in fields], dtype=np.float32),
+        np.asarray([field["offset"] for field in fields], dtype=np.float32),
+    )
@@ -1,5 +1,12 @@
 from datetime import datetime
 
+# Every profile field the bio is built from; a change to any other field leaves the bio as is
+BIO_FIELDS = (
+    "firstName", "dateOfBirth", "height", "gender", "religion", "education", "hobbies",
+    "interests", "spokenLanguages", "whatBringsYouHere", "minAge", "maxAge", "genderInterest",
+    "lookingFor", "favoriteColors", "pets",
+)
+
 def reformat_to_bio(json_data):
     # Extract _id
     _id = json_data.get("_id", "")
@@ -0,0 +1,42 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, Hashable, TypeVar
+from app.utils.metrics import Counter
+
+T = TypeVar("T")
+
+CALLS = Counter("single_flight_calls_total",
+                "Coalesced calls by role: leaders ran the computation, followers shared its result")
+
+
+class SingleFlight:
+    """
+    Concurrent calls with the same key share one in-flight computation.
+
+    The computation runs as its own task, so a caller that disconnects or
+    is cancelled does not cancel it for the callers still waiting on it.
+    Exceptions are delivered to every waiter. Results are not kept once
+    the computation finishes.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: Dict[Hashable, asyncio.Task] = {}
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        task = self._calls.get(key)
+        if task is None:
+            CALLS.inc(flight=self.name, role="leader")
+            task = self._calls[key] = asyncio.ensure_future(fn())
+            task.add_done_callback(lambda done: self._forget(key, done))
+        else:
+            CALLS.inc(flight=self.name, role="follower")
+        return await asyncio.shield(task)
+
+    def _forget(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            task.exception()   # retrieved here so a failure nobody awaited is not logged as lost
@@ -0,0 +1,95 @@
+import heapq
+from typing import Any, Callable, List, NamedTuple, Optional, Sequence, Tuple
+import numpy as np
+
+
+class TopK(NamedTuple):
+    ids: List[Any]          # candidate ids, best first
+    scores: np.ndarray      # float32 similarity per id
+    ranks: np.ndarray       # 1-based rank per id
+    indices: np.ndarray     # position of each id in the scored input
+
+
+def _empty() -> TopK:
+    return TopK([], np.empty(0, dtype=np.float32), np.empty(0, dtype=np.int32),
+                np.empty(0, dtype=np.int64))
+
+
+def top_k(scores: np.ndarray, k: int, ids: Optional[Sequence] = None) -> TopK:
+    """Best `k` of an in-memory score array: O(n) argpartition, then sort only k."""
+    scores = np.asarray(scores)
+    k = min(k, len(scores))
+    if k <= 0:
+        return _empty()
+
+    if k < len(scores):
+        indices = np.argpartition(-scores, k - 1)[:k]
+    else:
+        indices = np.arange(len(scores))
+    indices = indices[np.argsort(-scores[indices], kind="stable")]
+
+    return TopK(
+        ids=[ids[i] for i in indices] if ids is not None else indices.tolist(),
+        scores=scores[indices].astype(np.float32),
+        ranks=np.arange(1, k + 1, dtype=np.int32),
+        indices=indices,
+    )
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+async def top_k_stream(cursor, query, k: int, vector: Callable[[dict], Any],
+                       normalized: bool = True, chunk_size: int = 1024
+                       ) -> Tuple[TopK, List[dict]]:
+    """
+    Best `k` documents of an async cursor without holding every candidate.
+
+    Documents are scored a chunk at a time with one mat-vec and merged into
+    a bounded min-heap, so memory is O(k + chunk_size). `vector` extracts the
+    embedding from a document; pass `normalized=False` when the embeddings
+    are not unit length. The returned documents are the ones the cursor
+    produced, untouched.
+    """
+    query = np.asarray(query, dtype=np.float32)
+    if not normalized:
+        query = _normalize(query)
+    heap: List[Tuple[float, int, dict]] = []
+    position = 0
+    chunk: List[dict] = []
+
+    def merge(chunk: List[dict], offset: int) -> None:
+        matrix = np.asarray([vector(doc) for doc in chunk], dtype=np.float32)
+        scores = (matrix if normalized else _normalize(matrix)) @ query
+        best = top_k(scores, k)
+        for score, i in zip(best.scores.tolist(), best.indices.tolist()):
+            item = (score, offset + i, chunk[i])
+            if len(heap) < k:
+                heapq.heappush(heap, item)
+            elif score > heap[0][0]:
+                heapq.heapreplace(heap, item)
+            else:
+                break  # the rest of this chunk scores lower still
+
+    if k <= 0:
+        return _empty(), []
+
+    async for doc in cursor:
+        chunk.append(doc)
+        if len(chunk) == chunk_size:
+            merge(chunk, position)
+            position += len(chunk)
+            chunk = []
+    if chunk:
+        merge(chunk, position)
+
+    best = sorted(heap, key=lambda item: (-item[0], item[1]))
+    docs = [doc for _, _, doc in best]
+    return TopK(
+        ids=[doc.get("_id") for doc in docs],
+        scores=np.asarray([score for score, _, _ in best], dtype=np.float32),
+        ranks=np.arange(1, len(best) + 1, dtype=np.int32),
+        indices=np.asarray([i for _, i, _ in best], dtype=np.int64),
+    ), docs
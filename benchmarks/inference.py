@@ -0,0 +1,90 @@
+"""
+Encoder backends: cosine parity of the int8 ONNX model with torch, and throughput.
+
+    python -m benchmarks.inference [--n 512] [--batch 32] [--threads 4] [--min-cosine 0.98]
+
+Bios are generated with `reformat_to_bio` from random profiles, so lengths
+match production. Exits non-zero when any ONNX embedding falls below
+--min-cosine against the torch one, so it can gate a switch to
+INFERENCE_BACKEND=onnx. The ONNX model is exported to ONNX_MODEL_DIR first
+if it is not there yet.
+"""
+import argparse
+import os
+import sys
+import time
+import numpy as np
+from app.config.ai import MODEL_NAME
+from app.config.env import ONNX_MODEL_DIR
+from app.services.OnnxEncoder import MODEL_FILE, OnnxEncoder, export_onnx
+from app.utils.reformat_to_bio import reformat_to_bio
+
+WORDS = ["hiking", "jazz", "cooking", "chess", "surfing", "painting", "yoga", "travel", "films",
+         "reading", "running", "gardening", "photography", "gaming", "dancing", "climbing"]
+
+
+def bios(n: int, rng: np.random.Generator) -> list:
+    def pick(low, high):
+        return [str(w) for w in rng.choice(WORDS, size=int(rng.integers(low, high)), replace=False)]
+
+    return [reformat_to_bio({
+        "_id": i,
+        "firstName": f"User{i}",
+        "dateOfBirth": f"{rng.integers(1960, 2006)}-01-01",
+        "height": int(rng.integers(150, 200)),
+        "gender": str(rng.choice(["male", "female"])),
+        "genderInterest": str(rng.choice(["male", "female"])),
+        "hobbies": pick(1, 6),
+        "interests": pick(1, 6),
+        "spokenLanguages": [str(rng.choice(["English", "French", "Amharic", "Spanish"]))],
+        "favoriteColors": pick(0, 3),
+        "minAge": 20, "maxAge": 40,
+    })["bio"] for i in range(n)]
+
+
+def throughput(model, texts: list, batch: int) -> float:
+    model.encode(texts[:batch], batch_size=batch)   # warm up
+    start = time.perf_counter()
+    model.encode(texts, batch_size=batch, normalize_embeddings=True)
+    return len(texts) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--n", type=int, default=512)
+    parser.add_argument("--batch", type=int, default=32)
+    parser.add_argument("--threads", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--min-cosine", type=float, default=0.98)
+    parser.add_argument("--directory", default=ONNX_MODEL_DIR)
+    args = parser.parse_args()
+
+    import torch
+    from sentence_transformers import SentenceTransformer
+    torch.set_num_threads(args.threads)
+
+    if not os.path.exists(os.path.join(args.directory, MODEL_FILE)):
+        export_onnx(MODEL_NAME, args.directory)
+    reference = SentenceTransformer(MODEL_NAME, device="cpu")
+    onnx = OnnxEncoder(args.directory, intra_op_threads=args.threads)
+    texts = bios(args.n, np.random.default_rng(0))
+
+    expected = reference.encode(texts, batch_size=args.batch, normalize_embeddings=True)
+    actual = onnx.encode(texts, batch_size=args.batch, normalize_embeddings=True)
+    cosines = np.sum(expected * actual, axis=1)
+    print(f"Bios: {len(texts)} | threads: {args.threads} | batch: {args.batch}\n")
+    print(f"Cosine torch vs int8 ONNX: mean {cosines.mean():.5f} | min {cosines.min():.5f} | "
+          f"p1 {np.percentile(cosines, 1):.5f}")
+
+    torch_rate = throughput(reference, texts, args.batch)
+    onnx_rate = throughput(onnx, texts, args.batch)
+    print(f"{'backend':<12}{'bios/s':>10}")
+    print(f"{'torch':<12}{torch_rate:>10.1f}")
+    print(f"{'onnx int8':<12}{onnx_rate:>10.1f}   ({onnx_rate / torch_rate:.2f}x)")
+
+    if cosines.min() < args.min_cosine:
+        print(f"\nParity check failed: min cosine {cosines.min():.5f} < {args.min_cosine}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
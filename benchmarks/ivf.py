@@ -0,0 +1,69 @@
+"""
+IVF latency vs recall for a range of nprobe values.
+
+    python -m benchmarks.ivf [--n 200000] [--nlist 1024] [--k 20] [--from-db]
+
+Without --from-db the vectors are synthetic (clustered, unit length), so the
+numbers are indicative only; --from-db loads users.embedding from Mongo.
+"""
+import argparse
+import asyncio
+import time
+import numpy as np
+from app.services.IVFIndex import IVFIndex
+from app.utils.topk import top_k
+from benchmarks.quantization import from_db, synthetic
+
+NPROBES = (1, 2, 4, 8, 16, 32, 64, 128)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--n", type=int, default=200_000)
+    parser.add_argument("--nlist", type=int, default=1024)
+    parser.add_argument("--sample", type=int, default=100_000)
+    parser.add_argument("--k", type=int, default=20)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--from-db", action="store_true")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    vectors = asyncio.run(from_db()) if args.from_db else synthetic(args.n, rng)
+    ids = [str(i) for i in range(len(vectors))]
+
+    ivf = IVFIndex("unused", nlist=args.nlist)
+    start = time.perf_counter()
+    ivf.train(vectors[rng.choice(len(vectors), size=min(args.sample, len(vectors)), replace=False)])
+    train_time = time.perf_counter() - start
+    ivf.upsert(ids, vectors)
+    sizes = ivf.list_sizes()
+    print(f"Vectors: {len(vectors):,} | lists: {len(sizes)} (mean {sizes.mean():.0f}, max {sizes.max()}) "
+          f"| train {train_time:.1f} s")
+
+    queries = rng.choice(len(vectors), size=min(args.queries, len(vectors)), replace=False)
+    exact, exact_time = [], 0.0
+    for row in queries:
+        start = time.perf_counter()
+        exact.append(set(top_k(vectors @ vectors[row], args.k).indices.tolist()))
+        exact_time += time.perf_counter() - start
+    print(f"Brute force: {exact_time / len(queries) * 1000:.2f} ms/query\n")
+
+    print(f"{'nprobe':>6} {'recall@' + str(args.k):>10} {'ms/query':>9} {'scanned':>8}  recall")
+    for nprobe in NPROBES:
+        if nprobe > len(sizes):
+            break
+        recalls, elapsed = [], 0.0
+        for row, expected in zip(queries, exact):
+            start = time.perf_counter()
+            hits = ivf.query(vectors[row], args.k, nprobe=nprobe)
+            elapsed += time.perf_counter() - start
+            recalls.append(len(expected & {int(_id) for _id, _ in hits}) / args.k)
+
+        recall = np.mean(recalls)
+        scanned = nprobe / len(sizes)
+        print(f"{nprobe:>6} {recall:>10.4f} {elapsed / len(queries) * 1000:>9.2f} {scanned:>7.1%}  "
+              f"{'#' * int(round(recall * 40))}")
+
+
+if __name__ == "__main__":
+    main()
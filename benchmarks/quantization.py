@@ -0,0 +1,84 @@
+"""
+Int8 scalar quantization benchmark: memory and recall@k against the float path.
+
+    python -m benchmarks.quantization [--n 100000] [--k 20] [--rerank 200] [--from-db]
+
+Without --from-db the vectors are synthetic (clustered, unit length), so the
+numbers are indicative only; --from-db loads users.embedding from Mongo.
+"""
+import argparse
+import asyncio
+import time
+import numpy as np
+from bson import encode
+from app.utils import quantize
+from app.utils.topk import top_k
+
+DIM = 384
+
+
+def synthetic(n: int, rng: np.random.Generator) -> np.ndarray:
+    centers = rng.standard_normal((64, DIM)).astype(np.float32)
+    vectors = centers[rng.integers(0, len(centers), n)] + \
+        0.5 * rng.standard_normal((n, DIM)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+async def from_db() -> np.ndarray:
+    from app.services.Recommendation import Recommendation
+    batches = [vectors async for _, vectors in Recommendation.iter_embeddings()]
+    vectors = np.vstack(batches)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--n", type=int, default=100_000)
+    parser.add_argument("--k", type=int, default=20)
+    parser.add_argument("--rerank", type=int, default=200)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--from-db", action="store_true")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    vectors = asyncio.run(from_db()) if args.from_db else synthetic(args.n, rng)
+    n = len(vectors)
+    codes, scale, offset = quantize.quantize(vectors)
+
+    float_doc = len(encode({"embedding": vectors[0].astype(np.float64).tolist()}))
+    int8_doc = len(encode({"embeddingQ": quantize.to_field(vectors[0])}))
+    print(f"Vectors: {n:,} x {DIM}")
+    print(f"Mongo field per user:  float64 array {float_doc:>6,} B | embeddingQ {int8_doc:>5,} B "
+          f"({float_doc / int8_doc:.1f}x smaller)")
+    float_bytes = vectors.nbytes
+    int8_bytes = codes.nbytes + scale.nbytes + offset.nbytes
+    print(f"In-memory matrix:      float32 {float_bytes / 2**20:>10.1f} MiB | int8 {int8_bytes / 2**20:>8.1f} MiB "
+          f"({float_bytes / int8_bytes:.1f}x smaller)")
+
+    recall_int8, recall_rerank = [], []
+    exact_time = int8_time = 0.0
+    for row in rng.choice(n, size=min(args.queries, n), replace=False):
+        query = vectors[row]
+
+        start = time.perf_counter()
+        exact = set(top_k(vectors @ query, args.k).indices.tolist())
+        exact_time += time.perf_counter() - start
+
+        start = time.perf_counter()
+        approx = quantize.scores(codes, scale, offset, query)
+        shortlist = top_k(approx, args.rerank).indices
+        reranked = shortlist[top_k(vectors[shortlist] @ query, args.k).indices]
+        int8_time += time.perf_counter() - start
+
+        recall_int8.append(len(exact & set(top_k(approx, args.k).indices.tolist())) / args.k)
+        recall_rerank.append(len(exact & set(reranked.tolist())) / args.k)
+
+    queries = min(args.queries, n)
+    print(f"Recall@{args.k}: int8 only {np.mean(recall_int8):.4f} | "
+          f"int8 + float re-rank of {args.rerank} {np.mean(recall_rerank):.4f}")
+    print(f"Mean latency: float {exact_time / queries * 1000:.2f} ms | "
+          f"int8 + re-rank {int8_time / queries * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
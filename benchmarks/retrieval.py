@@ -0,0 +1,75 @@
+"""
+Bytes shipped from Mongo per recommendation request, one-phase vs two-phase.
+
+    python -m benchmarks.retrieval [--candidates 60] [--k 20] [--from-db]
+
+One-phase returns every candidate with its profile fields and a vector;
+two-phase returns candidate `_id`s (vectors come from the embedding store)
+and then profile fields for the final k only. Without --from-db a made-up
+profile document stands in for real users.
+"""
+import argparse
+import asyncio
+import numpy as np
+from bson import ObjectId, encode
+from app.utils import quantize
+from app.utils.bson_vector import encode_vector
+
+DIM = 384
+
+
+def synthetic_profile() -> dict:
+    return {
+        "_id": ObjectId(),
+        "firstName": "Alexandra",
+        "lastName": "Johnson",
+        "gender": "female",
+        "dateOfBirth": "1994-05-17T00:00:00.000Z",
+        "height": 168,
+        "photo": "https://cdn.example.com/users/6650c2f1e4b0a1b2c3d4e5f6/profile.jpg",
+        "location": {"type": "Point", "coordinates": [-73.9857, 40.7484]},
+        "age": 31,
+        "score": 87,
+        "hobbies": ["hiking", "photography", "cooking"],
+        "interests": ["travel", "music", "books", "yoga"],
+        "pets": ["dog"],
+        "favoriteColors": ["green", "blue"],
+        "spokenLanguages": ["English", "Spanish"],
+    }
+
+
+async def from_db(n: int) -> list:
+    from app.services.Recommendation import Recommendation
+    cursor = Recommendation.user_collection.find(
+        {"embedding": {"$exists": True}}, Recommendation.MATCH_PROJECTION).limit(n)
+    return await cursor.to_list()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--candidates", type=int, default=60, help="candidates scored per request")
+    parser.add_argument("--k", type=int, default=20)
+    parser.add_argument("--from-db", action="store_true")
+    args = parser.parse_args()
+
+    profiles = asyncio.run(from_db(100)) if args.from_db else [synthetic_profile()]
+    profile = int(np.mean([len(encode(doc)) for doc in profiles]))
+    vector = np.random.default_rng(0).standard_normal(DIM).astype(np.float32)
+    id_only = len(encode({"_id": ObjectId()}))
+
+    vectors = {
+        "float64 array": len(encode({"embedding": vector.astype(np.float64).tolist()})),
+        "float32 binary": len(encode({"embedding": encode_vector(vector)})),
+        "int8 embeddingQ": len(encode({"embeddingQ": quantize.to_field(vector)})),
+    }
+    two_phase = args.candidates * id_only + args.k * profile
+    print(f"Profile document: {profile:,} B | _id only: {id_only} B | "
+          f"{args.candidates} candidates, top {args.k}\n")
+    print(f"{'one-phase vector':<18} {'one-phase B':>12} {'two-phase B':>12} {'reduction':>10}")
+    for name, size in vectors.items():
+        one_phase = args.candidates * (profile + size)
+        print(f"{name:<18} {one_phase:>12,} {two_phase:>12,} {one_phase / two_phase:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Exact-scan latency of the sharded scoring executor across worker counts.
+
+    python -m benchmarks.scoring [--n 1000000] [--k 60] [--batch 1] [--mode process]
+
+Vectors are synthetic and written to a temporary embedding store. Speed-up is
+bounded by the number of physical cores and by memory bandwidth; the scan is
+a mat-vec for single queries, so expect less than linear scaling there.
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+import numpy as np
+from threadpoolctl import threadpool_limits
+from app.services.EmbeddingStore import EmbeddingStore
+from app.services.ScoringExecutor import ScoringExecutor
+from benchmarks.quantization import synthetic
+
+
+async def measure(executor: ScoringExecutor, queries: np.ndarray, k: int, batch: int) -> float:
+    await executor.query_many(queries[:batch], k, normalized=True)  # start workers, warm the page cache
+    start = time.perf_counter()
+    for first in range(0, len(queries), batch):
+        await executor.query_many(queries[first:first + batch], k, normalized=True)
+    return (time.perf_counter() - start) / (len(queries) / batch)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--n", type=int, default=1_000_000)
+    parser.add_argument("--k", type=int, default=60)
+    parser.add_argument("--batch", type=int, default=1, help="queries per call")
+    parser.add_argument("--queries", type=int, default=64)
+    parser.add_argument("--mode", choices=("process", "thread"), default="process")
+    parser.add_argument("--workers", type=int, nargs="+",
+                        default=sorted({1, 2, 4, 8, os.cpu_count() or 1}))
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    with tempfile.TemporaryDirectory() as directory:
+        store = EmbeddingStore(os.path.join(directory, "embeddings.f32"))
+        for start in range(0, args.n, 100_000):
+            count = min(100_000, args.n - start)
+            store.upsert([f"{i:024x}" for i in range(start, start + count)], synthetic(count, rng))
+        store.flush()
+        queries = synthetic(args.queries, rng)
+        print(f"Vectors: {len(store):,} | cores: {os.cpu_count()} | mode: {args.mode} | "
+              f"batch: {args.batch} | k: {args.k}\n")
+
+        with threadpool_limits(1):
+            start = time.perf_counter()
+            for first in range(0, len(queries), args.batch):
+                store.query_many(queries[first:first + args.batch], args.k, normalized=True)
+            inline = (time.perf_counter() - start) / (len(queries) / args.batch)
+        print(f"{'workers':>7} {'ms/call':>9} {'speed-up':>9}")
+        print(f"{'inline':>7} {inline * 1000:>9.2f} {1:>9.2f}")
+
+        for workers in args.workers:
+            executor = ScoringExecutor(store, workers=workers, mode=args.mode, min_shard_rows=1)
+            try:
+                with threadpool_limits(1):
+                    elapsed = asyncio.run(measure(executor, queries, args.k, args.batch))
+            finally:
+                executor.shutdown()
+            print(f"{workers:>7} {elapsed * 1000:>9.2f} {inline / elapsed:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
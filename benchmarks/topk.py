@@ -0,0 +1,84 @@
+"""
+Top-k selection micro-benchmark.
+
+    python -m benchmarks.topk [--k 20] [--repeat 5]
+
+Compares the old full `np.argsort` with `app.utils.topk.top_k`
+(argpartition) on in-memory score arrays, and the old "drain the cursor,
+then sort" path with `top_k_stream` (bounded heap) on a simulated cursor.
+"""
+import argparse
+import asyncio
+import time
+import numpy as np
+from app.utils.topk import top_k, top_k_stream
+
+SIZES = (1_000, 100_000, 1_000_000)
+DIM = 384
+
+
+def best_of(repeat: int, fn) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+class FakeCursor:
+    """Async iterator over `n` documents sharing a small pool of unit vectors."""
+
+    def __init__(self, n: int, pool: np.ndarray):
+        self.n = n
+        self.pool = pool
+
+    def __aiter__(self):
+        self.i = 0
+        return self
+
+    async def __anext__(self):
+        if self.i == self.n:
+            raise StopAsyncIteration
+        doc = {"_id": self.i, "embedding": self.pool[self.i % len(self.pool)]}
+        self.i += 1
+        return doc
+
+
+async def drain_and_sort(n: int, pool: np.ndarray, query: np.ndarray, k: int):
+    docs = [doc async for doc in FakeCursor(n, pool)]
+    scores = np.asarray([doc["embedding"] for doc in docs], dtype=np.float32) @ query
+    return [docs[i] for i in np.argsort(scores)[-k:][::-1]]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--k", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    pool = rng.standard_normal((4096, DIM)).astype(np.float32)
+    pool /= np.linalg.norm(pool, axis=1, keepdims=True)
+    query = pool[0]
+
+    print(f"In-memory selection, k={args.k}")
+    print(f"{'candidates':>12} {'argsort ms':>12} {'argpartition ms':>16} {'speedup':>8}")
+    for n in SIZES:
+        scores = rng.random(n, dtype=np.float32)
+        full = best_of(args.repeat, lambda: np.argsort(scores)[-args.k:][::-1])
+        partial = best_of(args.repeat, lambda: top_k(scores, args.k))
+        print(f"{n:>12,} {full * 1000:>12.3f} {partial * 1000:>16.3f} {full / partial:>7.1f}x")
+
+    print(f"\nCursor scoring + selection, k={args.k}, dim={DIM}")
+    print(f"{'candidates':>12} {'drain+sort ms':>14} {'stream heap ms':>15} {'speedup':>8}")
+    for n in SIZES:
+        repeat = 1 if n >= 1_000_000 else args.repeat
+        drained = best_of(repeat, lambda: asyncio.run(drain_and_sort(n, pool, query, args.k)))
+        streamed = best_of(repeat, lambda: asyncio.run(
+            top_k_stream(FakeCursor(n, pool), query, args.k, vector=lambda doc: doc["embedding"])))
+        print(f"{n:>12,} {drained * 1000:>14.1f} {streamed * 1000:>15.1f} {drained / streamed:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
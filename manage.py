@@ -0,0 +1,176 @@
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+import numpy as np
+from app.config.ai import MODEL_NAME
+from app.config.env import IVF_TRAIN_SAMPLE, SUGGESTIONS_SIZE, ONNX_MODEL_DIR, EMBEDDING_STORE_PATH
+from app.config.index import get_index, set_store
+from app.config.logger import logger
+from app.services.AI import AI
+from app.services.EmbeddingStore import EmbeddingStore
+from app.services.Recommendation import Recommendation
+
+
+async def index_build(args):
+    total = await Recommendation.build_index(rebuild=False, batch_size=args.batch_size)
+    logger.info(f"Index build complete: {total} embeddings indexed")
+
+
+async def index_rebuild(args):
+    total = await Recommendation.build_index(rebuild=True, batch_size=args.batch_size)
+    logger.info(f"Index rebuild complete: {total} embeddings indexed")
+
+
+async def store_build(args):
+    # Built next to the live store and moved over it, never written in place under a running server
+    directory = os.path.dirname(EMBEDDING_STORE_PATH) or "."
+    os.makedirs(directory, exist_ok=True)
+    with tempfile.TemporaryDirectory(dir=directory) as build:
+        store = EmbeddingStore(os.path.join(build, os.path.basename(EMBEDDING_STORE_PATH)))
+        total = await Recommendation.build_store(batch_size=args.batch_size, store=store)
+        store.move_to(EMBEDDING_STORE_PATH)
+    logger.info(f"Embedding store build complete: {total} embeddings stored; restart the server to load it")
+
+
+async def ivf_build(args):
+    total = await Recommendation.build_ivf(sample_size=args.sample, batch_size=args.batch_size)
+    logger.info(f"IVF build complete: {total} embeddings indexed")
+
+
+async def suggestions_compute(args):
+    # The server owns the store files: score against them read-only, or a private copy when empty
+    store = EmbeddingStore(EMBEDDING_STORE_PATH, readonly=True)
+    with tempfile.TemporaryDirectory() as scratch:
+        set_store(store if len(store) else EmbeddingStore(os.path.join(scratch, "embeddings.f32")))
+        total = await Recommendation.compute_suggestions(size=args.size, batch_size=args.batch_size)
+    logger.info(f"Precomputed suggestions for {total} users")
+
+
+async def embeddings_normalize(args):
+    total = await AI.normalize_embeddings(batch_size=args.batch_size)
+    logger.info(f"Normalized {total} stored embeddings")
+
+
+async def embeddings_convert(args):
+    total = await AI.convert_embeddings(batch_size=args.batch_size)
+    logger.info(f"Converted {total} stored embeddings to binary")
+
+
+async def model_export_onnx(args):
+    from app.services.OnnxEncoder import export_onnx
+    path = export_onnx(MODEL_NAME, args.directory)
+    logger.info(f"int8 ONNX model written to {path}; set INFERENCE_BACKEND=onnx to serve it")
+
+
+async def index_recall(args):
+    """Compare ANN results against exact brute-force cosine search."""
+    index = get_index()
+    if len(index) == 0:
+        logger.error("ANN index is empty, run `python manage.py index build` first")
+        return
+
+    ids, batches = [], []
+    async for batch_ids, vectors in Recommendation.iter_embeddings(args.batch_size):
+        ids += batch_ids
+        batches.append(vectors)
+    matrix = np.vstack(batches)
+    matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+
+    rng = np.random.default_rng(args.seed)
+    queries = rng.choice(len(ids), size=min(args.samples, len(ids)), replace=False)
+    k = min(args.k, len(ids))
+
+    recalls, ann_times, exact_times = [], [], []
+    for row in queries:
+        start = time.perf_counter()
+        exact = np.argpartition(-(matrix @ matrix[row]), k - 1)[:k]
+        exact_times.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        approx = index.query(matrix[row], k)
+        ann_times.append(time.perf_counter() - start)
+
+        expected = {ids[i] for i in exact}
+        recalls.append(len(expected & {_id for _id, _ in approx}) / k)
+
+    print(f"Vectors: {len(ids)} | queries: {len(queries)} | k: {k} | ef: {index.ef_search}")
+    print(f"Recall@{k}: mean {np.mean(recalls):.4f} | min {np.min(recalls):.4f}")
+    print(f"ANN latency:   p50 {np.percentile(ann_times, 50) * 1000:.3f} ms | "
+          f"p99 {np.percentile(ann_times, 99) * 1000:.3f} ms")
+    print(f"Exact latency: p50 {np.percentile(exact_times, 50) * 1000:.3f} ms | "
+          f"p99 {np.percentile(exact_times, 99) * 1000:.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Matching system maintenance commands")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    index = commands.add_parser("index", help="In-process ANN index")
+    index_commands = index.add_subparsers(dest="action", required=True)
+
+    build = index_commands.add_parser("build", help="Add every user embedding to the index")
+    build.set_defaults(func=index_build)
+
+    rebuild = index_commands.add_parser("rebuild", help="Rebuild the index from scratch")
+    rebuild.set_defaults(func=index_rebuild)
+
+    recall = index_commands.add_parser("recall", help="Report recall against brute force")
+    recall.add_argument("--samples", type=int, default=200)
+    recall.add_argument("-k", type=int, default=20)
+    recall.add_argument("--seed", type=int, default=0)
+    recall.set_defaults(func=index_recall)
+
+    ivf = commands.add_parser("ivf", help="IVF coarse-partition index")
+    ivf_commands = ivf.add_subparsers(dest="action", required=True)
+
+    ivf_build_command = ivf_commands.add_parser(
+        "build", help="Train the coarse quantizer on a sample and index every user")
+    ivf_build_command.add_argument("--sample", type=int, default=IVF_TRAIN_SAMPLE)
+    ivf_build_command.set_defaults(func=ivf_build)
+
+    store = commands.add_parser("store", help="Memory-mapped embedding store")
+    store_commands = store.add_subparsers(dest="action", required=True)
+
+    store_build_command = store_commands.add_parser(
+        "build", help="Copy every user embedding into the store")
+    store_build_command.set_defaults(func=store_build)
+
+    suggestions = commands.add_parser("suggestions", help="Precomputed suggestion lists")
+    suggestions_commands = suggestions.add_subparsers(dest="action", required=True)
+
+    compute = suggestions_commands.add_parser(
+        "compute", help="Recompute every active user's suggestion list (run from cron)")
+    compute.add_argument("--size", type=int, default=SUGGESTIONS_SIZE)
+    compute.set_defaults(func=suggestions_compute)
+
+    embeddings = commands.add_parser("embeddings", help="users.embedding migrations")
+    embeddings_commands = embeddings.add_subparsers(dest="action", required=True)
+
+    normalize = embeddings_commands.add_parser(
+        "normalize", help="L2-normalize stored embeddings in bulk")
+    normalize.set_defaults(func=embeddings_normalize)
+
+    convert = embeddings_commands.add_parser(
+        "convert", help="Rewrite legacy array embeddings as binary vectors")
+    convert.set_defaults(func=embeddings_convert)
+
+    model = commands.add_parser("model", help="Embedding model backends")
+    model_commands = model.add_subparsers(dest="action", required=True)
+
+    export = model_commands.add_parser(
+        "export-onnx", help="Export the encoder to ONNX with int8 dynamic quantization")
+    export.add_argument("--directory", default=ONNX_MODEL_DIR)
+    export.set_defaults(func=model_export_onnx)
+
+    for command in (build, rebuild, recall, ivf_build_command, store_build_command, compute,
+                    normalize, convert):
+        command.add_argument("--batch-size", type=int, default=1000)
+
+    args = parser.parse_args()
+    asyncio.run(args.func(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -5,6 +5,11 @@ from app.config.app import create_app
 from app.config.env import PORT
 from app.constants import QueueName
 from app.services.RabbitMQ import RabbitMQ
+from app.services.Recommendation import Recommendation
+from app.config.index import get_index, get_store, get_ivf, get_executor
+from app.config.env import CONVERT_EMBEDDINGS, SEARCH_BACKEND, SEGMENTED_INDEX
+from app.services.AI import AI
+from app.config.ai import get_inference
 
 app = create_app()
 
@@ -14,10 +19,28 @@ async def connect_to_rabbitMQ():
         await RabbitMQ.start_consumer(queue)
 
 
+async def warm_index():
+    #* Build the search structures from Mongo when nothing was saved on disk
+    if len(get_store()) == 0:
+        await Recommendation.build_store()
+    await Recommendation.build_features()
+    if SEGMENTED_INDEX:
+        await Recommendation.build_segments()
+    elif SEARCH_BACKEND == "hnsw" and len(get_index()) == 0:
+        await Recommendation.build_index()
+    elif SEARCH_BACKEND == "ivf" and len(get_ivf()) == 0:
+        await Recommendation.build_ivf()
+    await Recommendation.build_geo()
+
+
 async def main():
     tasks = [
-        asyncio.create_task(connect_to_rabbitMQ())
+        asyncio.create_task(connect_to_rabbitMQ()),
+        asyncio.create_task(warm_index())
     ]
+    if CONVERT_EMBEDDINGS:
+        #* Throttled so the rewrite never competes with live traffic for Mongo
+        tasks.append(asyncio.create_task(AI.convert_embeddings(pause=0.5)))
 
     #* Start Uvicorn server in the same event loop
     config = uvicorn.Config(app, host="0.0.0.0", port=int(PORT))
@@ -28,6 +51,13 @@ async def main():
         task.cancel()
     await asyncio.gather(*tasks, return_exceptions=True)
     await RabbitMQ.close()
+    if SEARCH_BACKEND == "hnsw" and not SEGMENTED_INDEX:
+        get_index().save()
+    if SEARCH_BACKEND == "ivf":
+        get_ivf().save()
+    get_executor().shutdown()
+    get_inference().shutdown()
+    get_store().flush()
 
 if __name__ == "__main__":
     asyncio.run(main())